@@ -13,6 +13,9 @@ from routes.interview_routes import interview_bp
 from routes.ai_routes import ai_bp
 from routes.notification_routes import notification_bp
 from routes.dashboard_routes import dashboard_bp
+from routes.metrics_routes import metrics_bp
+from utils.gemini import warm_up
+from utils import model_router
 
 
 # Load environment variables
@@ -20,7 +23,7 @@ load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000"], supports_credentials=True)
+CORS(app, origins=["http://localhost:3000"], supports_credentials=True, expose_headers=["Retry-After"])
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(user_bp, url_prefix='/api/users')
@@ -31,6 +34,10 @@ app.register_blueprint(interview_bp, url_prefix='/api/interviews')
 app.register_blueprint(ai_bp, url_prefix='/api/ai')
 app.register_blueprint(notification_bp, url_prefix='/api/notifications')
 app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+
+# Create the per-worker Gemini clients for every routed model up front
+warm_up(model_router.models())
 
 
 @app.route('/')
@@ -0,0 +1,77 @@
+"""Compare the old regex + ast.literal_eval parsing with utils.json_extract.
+
+Run from backend/:  python benchmarks/json_extract_bench.py
+
+Every output the parser rejects costs one more LLM call in create_roadmap,
+so "failures" is the number of regenerations each approach would trigger.
+"""
+import ast
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_extract import extract_json, validate_outline  # noqa: E402
+
+MODULE = {"title": "Module {i}", "objective": "Learn part {i}", "subtopics": ["Concept {i}.1", "Concept {i}.2", "Task {i}.3"]}
+
+
+def outline(n=7):
+    return [{k: (v.format(i=i) if isinstance(v, str) else [s.format(i=i) for s in v]) for k, v in MODULE.items()} for i in range(n)]
+
+
+def corpus():
+    clean = json.dumps(outline(), indent=2)
+    return {
+        "clean": clean,
+        "fenced": f"```json\n{clean}\n```",
+        "prose_around": f"Here is the roadmap you asked for:\n```json\n{clean}\n```\nLet me know if you need changes.",
+        "trailing_commas": clean.replace('"\n    ]', '",\n    ]').replace("}\n]", "},\n]"),
+        "python_literals": repr(outline()),
+        "truncated_tail": clean[: int(len(clean) * 0.9)],
+        "nested_in_fence_nongreedy": "```json\n" + json.dumps({"modules": outline()}) + "\n```",
+    }
+
+
+def legacy_parse(content):
+    match = re.search(r"```(?:json)?\s*(\[.*?\])\s*```", content, re.DOTALL)
+    json_str = match.group(1).strip() if match else content.strip()
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return ast.literal_eval(json_str)
+
+
+def new_parse(content):
+    return validate_outline(extract_json(content, expect="["))
+
+
+def bench(parse, text, repeat=2000):
+    try:
+        parse(text)
+    except Exception:
+        return None, True
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(text)
+    return (time.perf_counter() - start) / repeat * 1e6, False
+
+
+def main():
+    print(f"{'case':28} {'legacy us':>10} {'extractor us':>13}")
+    failures = {"legacy": 0, "extractor": 0}
+    for name, text in corpus().items():
+        row = []
+        for label, parse in (("legacy", legacy_parse), ("extractor", new_parse)):
+            cost, failed = bench(parse, text)
+            failures[label] += failed
+            row.append("FAIL" if failed else f"{cost:.1f}")
+        print(f"{name:28} {row[0]:>10} {row[1]:>13}")
+    print(f"\nregenerations needed: legacy={failures['legacy']} extractor={failures['extractor']}")
+
+
+if __name__ == "__main__":
+    main()
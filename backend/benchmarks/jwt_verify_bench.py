@@ -0,0 +1,54 @@
+"""Per-request cost of verifying the auth token, before and after the cache.
+
+Run from backend/:  python benchmarks/jwt_verify_bench.py
+
+"legacy" is the old verify_token: read JWT_SECRET_KEY from the environment
+and check the HMAC on every call. "uncached" is the new path on a cache miss
+(header parse, key lookup, HMAC); "cached" is a repeat request with the same
+token, which is what every request after a user's first one looks like.
+"""
+import os
+import sys
+import time
+
+import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import jwt_utils  # noqa: E402
+from utils.jwt_utils import JWTUtils  # noqa: E402
+
+USER = {'_id': '0' * 24, 'email': 'mentee@example.com', 'username': 'mentee', 'role': 'mentee'}
+
+
+def legacy_verify(token):
+    return jwt.decode(token, os.environ.get('JWT_SECRET_KEY', 'your-secret-key'), algorithms=['HS256'])
+
+
+def uncached_verify(token):
+    jwt_utils._verified.clear()
+    return JWTUtils.verify_token(token)
+
+
+def bench(verify, token, repeat=20000):
+    verify(token)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        verify(token)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    token = JWTUtils.generate_token(USER)
+    results = {
+        "legacy": bench(legacy_verify, token),
+        "uncached": bench(uncached_verify, token),
+        "cached": bench(JWTUtils.verify_token, token),
+    }
+    for name, cost in results.items():
+        print(f"{name:10} {cost:8.2f} us/request")
+    print(f"\nspeedup cached vs legacy: {results['legacy'] / results['cached']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Login throughput against the number of password hashing processes.
+
+Run from backend/:  python benchmarks/login_throughput_bench.py [iterations]
+
+Each round fires CLIENTS concurrent logins (one PBKDF2 hash each) at a
+PasswordHasher with the given number of worker processes and its default
+queue bound. "inline" is the old behaviour: hashing in the request thread.
+Logins the pool cannot admit fail fast with a 429, which is reported
+separately from the ones that completed.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.custom_error import CustomError  # noqa: E402
+from utils.password_hasher import PasswordHasher, PASSWORD_HASH_ITERATIONS  # noqa: E402
+
+CLIENTS = 32
+LOGINS = 128
+
+
+def login(hasher, iterations):
+    started = time.perf_counter()
+    try:
+        hasher.hash("salt", "correct horse battery staple", iterations)
+        return True, time.perf_counter() - started
+    except CustomError:
+        return False, time.perf_counter() - started
+
+
+def run(workers, iterations):
+    hasher = PasswordHasher(workers=workers, queue=4 * max(1, workers))
+    if workers:
+        hasher.hash("warm", "up", 1)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as clients:
+        results = list(clients.map(lambda _: login(hasher, iterations), range(LOGINS)))
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+    ok = [latency for success, latency in results if success]
+    rejected = [latency for success, latency in results if not success]
+    return {
+        "logins_per_s": len(ok) / elapsed,
+        "ok": len(ok),
+        "rejected": len(rejected),
+        "p50_ms": sorted(ok)[len(ok) // 2] * 1000 if ok else 0.0,
+        "reject_ms": max(rejected) * 1000 if rejected else 0.0,
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else PASSWORD_HASH_ITERATIONS
+    print(f"{LOGINS} logins from {CLIENTS} concurrent clients, {iterations} iterations, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8} {'logins/s':>9} {'ok':>5} {'429s':>5} {'p50 ms':>8} {'429 max ms':>11}")
+    for workers in [0, 1, 2, 4, 8]:
+        r = run(workers, iterations)
+        label = "inline" if workers == 0 else str(workers)
+        print(f"{label:>8} {r['logins_per_s']:9.1f} {r['ok']:5} {r['rejected']:5} {r['p50_ms']:8.1f} {r['reject_ms']:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from utils.jwt_utils import JWTUtils
 from utils.custom_error import CustomError
 from datetime import datetime, timedelta
 from models.user import UserModel
+from services import matching_service
+from utils.skill_taxonomy import annotate_profile
 
 class AuthController:
     @staticmethod
@@ -183,12 +185,14 @@ class AuthController:
             # Merge updates into existing profile
             updated_profile = user_db_object.get('profile', {}).copy()
             updated_profile.update(profile_updates)
+            annotate_profile(updated_profile)
 
             # Update in DB
             UserModel.update_user(user_id, {'profile': updated_profile})
 
             # Fetch updated user
             updated_user = UserModel.get_user_by_id(user_id)
+            matching_service.on_user_saved(updated_user)
 
             # Prepare response
             api_user_object = {
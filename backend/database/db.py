@@ -24,6 +24,11 @@ interview_questions = db.interview_questions
 notifications = db.notifications
 ai_learning_data = db.ai_learning_data
 messages = db.messages
+llm_cache = db.llm_cache
+roadmap_jobs = db.roadmap_jobs
+search_cache = db.search_cache
+flight_leases = db.flight_leases
+llm_calls = db.llm_calls
 
 # Create indexes for better query performance
 users.create_index('email', unique=True)
@@ -32,3 +37,12 @@ roadmaps.create_index([('mentor_id', 1), ('mentee_id', 1)])
 chats.create_index([('mentor_id', 1), ('mentee_id', 1)])
 meetings.create_index([('mentor_id', 1), ('mentee_id', 1)])
 messages.create_index([('sender_id', 1), ('receiver_id', 1), ('timestamp', -1)])
+llm_cache.create_index('expires_at', expireAfterSeconds=0)
+roadmap_jobs.create_index([('status', 1), ('created_at', 1)])
+roadmap_jobs.create_index('lease_expires_at')
+# At most one queued or running job per mentee; finished jobs drop the active flag
+roadmap_jobs.create_index('menteeId', unique=True, partialFilterExpression={'active': True})
+search_cache.create_index('expires_at', expireAfterSeconds=0)
+flight_leases.create_index('expires_at', expireAfterSeconds=0)
+llm_calls.create_index('expires_at', expireAfterSeconds=0)
+llm_calls.create_index([('caller', 1), ('created_at', -1)])
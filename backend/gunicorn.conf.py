@@ -0,0 +1,13 @@
+import os
+
+# Threaded workers: a long request (the roadmap job SSE stream polls for up to
+# ROADMAP_STREAM_TIMEOUT seconds) holds one thread, not the whole worker.
+# Keep ROADMAP_STREAM_MAX below GUNICORN_THREADS so streams can never take
+# every thread of a worker.
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+# With gthread the timeout only reaps workers whose main loop stops, so it
+# does not cut off open streams
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
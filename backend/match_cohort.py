@@ -0,0 +1,36 @@
+import argparse
+import json
+from dotenv import load_dotenv
+
+from services.matching_service import match_cohort, MENTOR_CAPACITY, COHORT_CANDIDATES
+from utils.custom_error import CustomError
+
+load_dotenv()
+
+
+def main():
+    """Match a cohort of mentees to mentors in one pass, respecting mentor capacity."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('mentee_ids', nargs='*', help='mentees to match (default: every mentee without a mentor)')
+    parser.add_argument('--capacity', type=int, default=MENTOR_CAPACITY,
+                        help='mentees per mentor when the profile sets no max_mentees')
+    parser.add_argument('--candidates', type=int, default=COHORT_CANDIDATES,
+                        help='best-scoring mentors considered per mentee')
+    parser.add_argument('--dry-run', action='store_true', help='print the assignment without linking anyone')
+    args = parser.parse_args()
+
+    try:
+        result = match_cohort(args.mentee_ids or None, args.capacity, args.candidates, commit=not args.dry_run)
+    except CustomError as ce:
+        parser.error(ce.message)
+    for pair in result['assigned']:
+        print(f"{pair['mentee']} -> {pair['mentor']} ({pair['score']})")
+    for mentee_id in result['unassigned']:
+        print(f"{mentee_id} -> unassigned")
+    for mentee_id in result['already_matched']:
+        print(f"{mentee_id} -> skipped, already has a mentor")
+    print(json.dumps(result['stats']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,51 @@
+from collections.abc import Mapping
 from functools import wraps
 from flask import request, jsonify, g
 from utils.jwt_utils import JWTUtils
 from utils.custom_error import CustomError
 from models.user import UserModel
+from utils import user_cache
+
+# What token_required loads up front; most routes need nothing else
+AUTH_FIELDS = {'_id': 1, 'role': 1, 'username': 1}
+# The rest of the user, loaded on first use; password hashes are never needed here
+REST_FIELDS = {'authentication': 0}
+
+
+class LazyUser(Mapping):
+    """The authenticated user for one request.
+
+    Starts with AUTH_FIELDS; reading any other field loads the rest of the
+    document once, and later reads in the same request use that copy.
+    """
+
+    def __init__(self, user, load_rest):
+        self._user = user
+        self._load_rest = load_rest
+        self._complete = False
+
+    def _ensure(self, key=None):
+        if not self._complete and (key is None or key not in self._user):
+            self._complete = True
+            self._user = self._load_rest() or self._user
+
+    def __getitem__(self, key):
+        self._ensure(key)
+        return self._user[key]
+
+    def __iter__(self):
+        self._ensure()
+        return iter(self._user)
+
+    def __len__(self):
+        self._ensure()
+        return len(self._user)
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"LazyUser({self._user!r}, complete={self._complete})"
 
 def token_required(f):
     @wraps(f)
@@ -30,10 +73,14 @@ def token_required(f):
             if not user_id:
                 raise CustomError("Invalid token payload", 401)
 
-            # Retrieve user from database
-            current_user = UserModel.get_user_by_id(user_id)
+            # Retrieve user from this worker's cache, else the database
+            current_user = user_cache.get(user_id, lambda u_id: UserModel.get_user_by_id(u_id, AUTH_FIELDS), 'auth')
             if not current_user:
                 raise CustomError("User not found", 401)
+            current_user = LazyUser(
+                current_user,
+                lambda: user_cache.get(user_id, lambda u_id: UserModel.get_user_by_id(u_id, REST_FIELDS))
+            )
 
             # Attach to Flask global context
             g.current_user = current_user
@@ -1,11 +1,14 @@
 from bson.objectid import ObjectId
 from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 from database.db import roadmaps
 
 class RoadmapModel:
     @staticmethod
     def create_roadmap(mentee_id, mentor_id, duration_weeks, modules,
-                       interview_type="progress_based", trigger_point="50%") -> dict:
+                       interview_type="progress_based", trigger_point="50%", roadmap_id=None) -> dict:
+        """Insert a roadmap; with roadmap_id, creating the same id twice returns the existing one."""
         roadmap_doc = {
             "menteeId": ObjectId(mentee_id),
             "status": "in-progress",
@@ -24,8 +27,15 @@ class RoadmapModel:
             "updated_at": datetime.utcnow()
         }
 
-        result = roadmaps.insert_one(roadmap_doc)
-        return roadmaps.find_one({"_id": result.inserted_id}) 
+        if roadmap_id is not None:
+            roadmap_doc["_id"] = ObjectId(roadmap_id)
+        try:
+            inserted_id = roadmaps.insert_one(roadmap_doc).inserted_id
+        except DuplicateKeyError:
+            if roadmap_id is None:
+                raise
+            inserted_id = roadmap_doc["_id"]
+        return roadmaps.find_one({"_id": inserted_id})
 
     @staticmethod
     def get_roadmaps_by_mentee(mentee_id):
@@ -107,10 +117,15 @@ class RoadmapModel:
         return result
     
     @staticmethod
-    def replace_roadmap_by_id(roadmap_id, updated_roadmap_data: dict):
+    def replace_roadmap_by_id(roadmap_id, updated_roadmap_data: dict, job_id=None):
+        """Replace the roadmap; with job_id, an edit that job already made is not made again."""
         try:
             updated_roadmap_data['_id'] = ObjectId(roadmap_id)
             updated_roadmap_data['updated_at'] = datetime.utcnow()
+            query = {"_id": ObjectId(roadmap_id)}
+            if job_id is not None:
+                updated_roadmap_data['last_edit_job'] = ObjectId(job_id)
+                query['last_edit_job'] = {"$ne": ObjectId(job_id)}
 
             existing = roadmaps.find_one({"_id": ObjectId(roadmap_id)})
             if existing and 'created_at' in existing:
@@ -119,13 +134,67 @@ class RoadmapModel:
                 updated_roadmap_data['created_at'] = datetime.utcnow()
 
             # Replace document
-            result = roadmaps.replace_one({"_id": ObjectId(roadmap_id)}, updated_roadmap_data)
+            result = roadmaps.replace_one(query, updated_roadmap_data)
             return result.modified_count > 0
 
         except Exception as e:
             print(f"Error replacing roadmap: {e}")
             return False
 
+    @staticmethod
+    def apply_patch(roadmap_id, patch: dict, job_id=None):
+        """Persist a roadmap edit patch as targeted updates in one ordered bulk write.
+
+        Module indexes in the patch refer to the roadmap before the edit, so
+        in-place changes run first, then removals, then appended modules.
+        With job_id, the last update stamps the roadmap with it and every
+        update skips a roadmap already stamped, so a retried job does not
+        apply its edit twice.
+        """
+        query = {"_id": ObjectId(roadmap_id)}
+        if job_id is not None:
+            query["last_edit_job"] = {"$ne": ObjectId(job_id)}
+        ops = []
+        for change in patch.get("modify", []):
+            path = f"modules.{change['index']}"
+            fields = {}
+            if change.get("title"):
+                fields[f"{path}.title"] = change["title"]
+            if change.get("objective"):
+                fields[f"{path}.objective"] = change["objective"]
+            if fields:
+                ops.append(UpdateOne(query, {"$set": fields}))
+            # $pull and $push on the same array must be separate updates
+            if change.get("remove_subtopics"):
+                ops.append(UpdateOne(query, {"$pull": {
+                    f"{path}.subtopics": {"title": {"$in": change["remove_subtopics"]}}
+                }}))
+            if change.get("add_subtopics"):
+                ops.append(UpdateOne(query, {"$push": {
+                    f"{path}.subtopics": {"$each": change["add_subtopics"]}
+                }}))
+            if change.get("remove_subtopics") or change.get("add_subtopics"):
+                ops.append(UpdateOne(query, {"$unset": {
+                    f"{path}.evaluation": "",
+                    f"{path}.evaluation_claimed_at": ""
+                }}))
+
+        if patch.get("remove"):
+            ops.append(UpdateOne(query, {"$unset": {f"modules.{i}": "" for i in patch["remove"]}}))
+            ops.append(UpdateOne(query, {"$pull": {"modules": None}}))
+        if patch.get("add"):
+            ops.append(UpdateOne(query, {"$push": {"modules": {"$each": patch["add"]}}}))
+
+        done = {"updated_at": datetime.utcnow()}
+        if job_id is not None:
+            done["last_edit_job"] = ObjectId(job_id)
+        ops.append(UpdateOne(query, {"$set": done}))
+        return roadmaps.bulk_write(ops, ordered=True)
+
+    @staticmethod
+    def get_roadmap_by_id(roadmap_id):
+        return roadmaps.find_one({"_id": ObjectId(roadmap_id)})
+
     @staticmethod
     def get_roadmap_as_dict_for_update(roadmap_id):
         try:
@@ -0,0 +1,151 @@
+from bson.objectid import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database.db import roadmap_jobs
+
+class RoadmapJobModel:
+    @staticmethod
+    def enqueue(mentor_id, mentee_id, conversation) -> dict:
+        """Queue a roadmap generation job, or return the mentee's already active one.
+
+        The unique index on active jobs makes this safe against concurrent
+        requests for the same mentee.
+        """
+        job_doc = {
+            "mentorId": ObjectId(mentor_id),
+            "menteeId": ObjectId(mentee_id),
+            "conversation": conversation,
+            "status": "queued",
+            "active": True,
+            "progress": {"stage": "queued", "modules_done": 0, "modules_total": 0},
+            "attempts": 0,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "not_before": None,
+            "mode": None,
+            "roadmap_id": None,
+            "partial": {"outline": None, "resources": {}, "evaluations": {}},
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+        try:
+            result = roadmap_jobs.insert_one(job_doc)
+        except DuplicateKeyError:
+            existing = RoadmapJobModel.get_active_job_for_mentee(mentee_id)
+            if existing:
+                return existing
+            # The active job finished between the insert and the read
+            result = roadmap_jobs.insert_one(job_doc)
+        job_doc["_id"] = result.inserted_id
+        return job_doc
+
+    @staticmethod
+    def claim(worker_id, lease_seconds):
+        """Atomically take the oldest queued job past its retry backoff, or a running one whose lease has lapsed"""
+        now = datetime.utcnow()
+        return roadmap_jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "$or": [{"not_before": None}, {"not_before": {"$lte": now}}]},
+                {"status": "running", "lease_expires_at": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def heartbeat(job_id, worker_id, lease_seconds) -> bool:
+        """Extend the lease; False means another worker has taken the job over"""
+        now = datetime.utcnow()
+        result = roadmap_jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id, "status": "running"},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=lease_seconds), "updated_at": now}}
+        )
+        return result.matched_count > 0
+
+    @staticmethod
+    def set_target(job_id, worker_id, mode, roadmap_id) -> bool:
+        """Record whether the job creates or edits a roadmap, and which one, before it touches either.
+
+        A retried job reads these back instead of re-deciding from the
+        mentee's current roadmap link, which its earlier attempt may have set.
+        False means another worker has taken the job over.
+        """
+        result = roadmap_jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id, "status": "running"},
+            {"$set": {"mode": mode, "roadmap_id": ObjectId(roadmap_id), "updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    @staticmethod
+    def set_progress(job_id, worker_id, stage, modules_done=0, modules_total=0):
+        return roadmap_jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id},
+            {"$set": {
+                "progress": {"stage": stage, "modules_done": modules_done, "modules_total": modules_total},
+                "updated_at": datetime.utcnow()
+            }}
+        )
+
+    @staticmethod
+    def save_checkpoint(job_id, worker_id, field, value):
+        """Record a finished generation stage under partial.<field>"""
+        return roadmap_jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id},
+            {"$set": {f"partial.{field}": value, "updated_at": datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def complete(job_id, worker_id, roadmap_id):
+        return roadmap_jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id},
+            {"$set": {
+                "status": "done",
+                "roadmap_id": ObjectId(roadmap_id),
+                "progress.stage": "done",
+                "lease_expires_at": None,
+                "updated_at": datetime.utcnow()
+            }, "$unset": {"active": ""}}
+        )
+
+    @staticmethod
+    def fail(job_id, worker_id, error, retry=False, retry_in=0):
+        """Requeue the job to be claimed again after retry_in seconds, or mark it failed"""
+        now = datetime.utcnow()
+        update = {"$set": {
+            "status": "queued" if retry else "failed",
+            "error": error,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "not_before": now + timedelta(seconds=retry_in) if retry else None,
+            "updated_at": now
+        }}
+        if not retry:
+            update["$unset"] = {"active": ""}
+        return roadmap_jobs.update_one({"_id": ObjectId(job_id), "worker_id": worker_id}, update)
+
+    @staticmethod
+    def get_active_job_for_mentee(mentee_id):
+        """Queued or running job for this mentee, if any"""
+        return roadmap_jobs.find_one(
+            {"menteeId": ObjectId(mentee_id), "status": {"$in": ["queued", "running"]}},
+            {"conversation": 0, "partial": 0}
+        )
+
+    @staticmethod
+    def get_job(job_id, include_partial=False):
+        projection = {"conversation": 0} if include_partial else {"conversation": 0, "partial": 0}
+        try:
+            return roadmap_jobs.find_one({"_id": ObjectId(job_id)}, projection)
+        except Exception:
+            return None
@@ -1,7 +1,9 @@
 from bson.objectid import ObjectId
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from pymongo import UpdateOne
 from database.db import users
+from utils import user_cache
 
 class UserModel:
     @staticmethod
@@ -48,10 +50,10 @@ class UserModel:
         return users.find_one({'email': email})
 
     @staticmethod
-    def get_user_by_id(user_id):
-        """Get user by ID"""
+    def get_user_by_id(user_id, fields=None):
+        """Get user by ID, optionally only the given projection"""
         try:
-            return users.find_one({'_id': ObjectId(user_id)})
+            return users.find_one({'_id': ObjectId(user_id)}, fields)
         except:
             return None
 
@@ -59,15 +61,19 @@ class UserModel:
     def update_user(user_id, update_data):
         """Update user data"""
         update_data['updated_at'] = datetime.utcnow()
-        return users.update_one(
+        result = users.update_one(
             {'_id': ObjectId(user_id)},
             {'$set': update_data}
         )
+        user_cache.invalidate(user_id)
+        return result
 
     @staticmethod
     def delete_user(user_id):
         """Delete user"""
-        return users.delete_one({'_id': ObjectId(user_id)})
+        result = users.delete_one({'_id': ObjectId(user_id)})
+        user_cache.invalidate(user_id)
+        return result
     
     @staticmethod
     def get_all_mentors():
@@ -96,6 +102,7 @@ class UserModel:
                 {'_id': ObjectId(mentee_id)},
                 {'$addToSet': {'mentors': ObjectId(mentor_id)}, '$set': {'updated_at': datetime.utcnow()}}
             )
+            user_cache.invalidate(mentor_id, mentee_id)
 
             return True
 
@@ -103,11 +110,56 @@ class UserModel:
             print(f"Error linking mentor and mentee: {e}")
             return False
     
+    @staticmethod
+    def get_mentees_for_matching(mentee_ids=None):
+        """Mentees to match: the given ids, or every mentee without a mentor"""
+        query = {'role': 'mentee'}
+        if mentee_ids:
+            query['_id'] = {'$in': [ObjectId(m_id) for m_id in mentee_ids]}
+        else:
+            query['$or'] = [{'mentors': {'$exists': False}}, {'mentors': {'$size': 0}}]
+        return list(users.find(query, {'profile.goals': 1, 'mentors': 1}))
+
+    @staticmethod
+    def get_mentor_loads():
+        """Map each mentor id to (profile.max_mentees or None, current mentee count)"""
+        cursor = users.aggregate([
+            {'$match': {'role': 'mentor'}},
+            {'$project': {
+                'max_mentees': '$profile.max_mentees',
+                'count': {'$size': {'$ifNull': ['$mentees', []]}}
+            }}
+        ])
+        return {str(d['_id']): (d.get('max_mentees'), d['count']) for d in cursor}
+
+    @staticmethod
+    def link_many(pairs):
+        """Link (mentor_id, mentee_id) pairs in a single bulk write"""
+        now = datetime.utcnow()
+        ops = []
+        mentees_by_mentor = {}
+        for mentor_id, mentee_id in pairs:
+            mentees_by_mentor.setdefault(mentor_id, []).append(ObjectId(mentee_id))
+            ops.append(UpdateOne(
+                {'_id': ObjectId(mentee_id)},
+                {'$addToSet': {'mentors': ObjectId(mentor_id)}, '$set': {'updated_at': now}}
+            ))
+        for mentor_id, mentee_ids in mentees_by_mentor.items():
+            ops.append(UpdateOne(
+                {'_id': ObjectId(mentor_id)},
+                {'$addToSet': {'mentees': {'$each': mentee_ids}}, '$set': {'updated_at': now}}
+            ))
+        if not ops:
+            return None
+        result = users.bulk_write(ops, ordered=False)
+        user_cache.invalidate(*mentees_by_mentor, *(mentee_id for _, mentee_id in pairs))
+        return result
+
     @staticmethod
     def add_roadmap_id_to_user(user_id, roadmap_id):
         """Add or update roadmap_id field in user"""
         try:
-            return users.update_one(
+            result = users.update_one(
                 {'_id': ObjectId(user_id)},
                 {
                     '$set': {
@@ -116,6 +168,8 @@ class UserModel:
                     }
                 }
             )
+            user_cache.invalidate(user_id)
+            return result
         except Exception as e:
             print(f"Error adding roadmap_id to user: {e}")
             return None
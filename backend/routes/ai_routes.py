@@ -1,17 +1,35 @@
-from flask import Blueprint, request, jsonify, g
-import datetime
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import hmac
+import os
+import threading
+import time
 from bson.objectid import ObjectId
 import json
 import tempfile
-from database.db import ai_learning_data
+from database.db import roadmaps
 from middleware.auth_middleware import token_required
-from services.ai_service import match_mentor_mentee, generate_roadmap, generate_interview_questions, update_roadmap
+from services.ai_service import match_mentor_mentee, generate_interview_questions
 from services.ai_service import get_feedback
+from services.matching_service import MATCH_MODES, match_cohort
 from models.user import UserModel
 from models.roadmap import RoadmapModel
+from models.roadmap_job import RoadmapJobModel
+from utils.custom_error import CustomError
 
 ai_bp = Blueprint('ai', __name__)
 
+ROADMAP_STREAM_TIMEOUT = int(os.environ.get('ROADMAP_STREAM_TIMEOUT', '300'))
+ROADMAP_STREAM_POLL = float(os.environ.get('ROADMAP_STREAM_POLL', '0.5'))
+# Open job streams per user and in total, per worker process. Each holds a
+# server thread (see gunicorn.conf.py), so the total must stay below
+# GUNICORN_THREADS to leave threads for ordinary requests.
+ROADMAP_STREAMS_PER_USER = int(os.environ.get('ROADMAP_STREAMS_PER_USER', '2'))
+ROADMAP_STREAM_MAX = int(os.environ.get('ROADMAP_STREAM_MAX', '8'))
+_streams_lock = threading.Lock()
+_open_streams = {}
+# Shared secret for operators running cohort matches; unset disables the endpoint
+COHORT_MATCH_TOKEN = os.environ.get('COHORT_MATCH_TOKEN')
+
 @ai_bp.route('/match', methods=['POST'])
 @token_required
 def match_mentors(current_user):
@@ -22,8 +40,11 @@ def match_mentors(current_user):
     mentee_experience = profile.get('experience_level', '')
     if not mentee_skills:
         return jsonify({'message': 'User profile goals are required for matching'}), 400
+    mode = (request.get_json(silent=True) or {}).get('mode')
+    if mode is not None and mode not in MATCH_MODES:
+        return jsonify({'message': f'mode must be one of {", ".join(MATCH_MODES)}'}), 400
     try:
-        match_result = match_mentor_mentee(mentee_skills, mentee_experience)
+        match_result = match_mentor_mentee(mentee_skills, mentee_experience, profile.get('languages', []), mode)
         if not match_result:
             return jsonify({'message': 'No mentor match found'}), 404
         mentor_id = match_result['mentor']
@@ -40,9 +61,36 @@ def match_mentors(current_user):
                 'username': mentor.get('username', '')
             }
         }), 200
+    except CustomError as ce:
+        return jsonify({'message': ce.message}), ce.status_code
     except Exception as e:
         return jsonify({'message': f'Error matching mentors: {str(e)}'}), 500
 
+@ai_bp.route('/match/cohort', methods=['POST'])
+@token_required
+def match_mentee_cohort(current_user):
+    if not COHORT_MATCH_TOKEN or not hmac.compare_digest(request.headers.get('X-Cohort-Token', ''), COHORT_MATCH_TOKEN):
+        return jsonify({'message': 'Cohort matching is not allowed'}), 403
+    data = request.get_json(silent=True) or {}
+    mentee_ids = data.get('mentee_ids')
+    if mentee_ids is not None and not isinstance(mentee_ids, list):
+        return jsonify({'message': 'mentee_ids must be a list'}), 400
+    capacity = data.get('capacity')
+    # bool is an int subclass, so JSON true/false would otherwise pass
+    if capacity is not None and (not isinstance(capacity, int) or isinstance(capacity, bool) or capacity < 0):
+        return jsonify({'message': 'capacity must be a non-negative integer'}), 400
+    try:
+        result = match_cohort(
+            mentee_ids,
+            default_capacity=capacity,
+            commit=not data.get('dry_run', False)
+        )
+        return jsonify(result), 200
+    except CustomError as ce:
+        return jsonify({'message': ce.message}), ce.status_code
+    except Exception as e:
+        return jsonify({'message': f'Error matching cohort: {str(e)}'}), 500
+
 # @ai_bp.route('/roadmap', methods=['POST'])
 # @token_required
 # def create_roadmap(current_user):
@@ -88,36 +136,8 @@ def match_mentors(current_user):
 #         return jsonify({'message': f'Error generating roadmap: {str(e)}'}), 500
 
 
-@ai_bp.route('/roadmap', methods=['POST'])
-@token_required
-def create_roadmap(current_user):
-    data = request.get_json()
-    conversation = data.get('conversation')
-    mentee_id = data.get('mentee_id')
-    if not conversation:
-        return jsonify({'message': 'conversation is required'}), 400
-    if not mentee_id:
-        return jsonify({'message': 'Mentee ID is required'}), 400
-    
-    roadmap_id = UserModel.get_user_roadmap_id(mentee_id)
-
-    if roadmap_id is None:
-        modules_content = generate_roadmap(conversation) 
-        db_roadmap = RoadmapModel.create_roadmap(
-            mentee_id=mentee_id, 
-            mentor_id=str(current_user.get('_id')), 
-            duration_weeks=8, 
-            modules=modules_content
-        )
-        UserModel.add_roadmap_id_to_user(mentee_id, db_roadmap['_id'])
-        if not db_roadmap:
-            return jsonify({'message': 'Failed to create roadmap in database'}), 500
-    else:
-        roadmap = RoadmapModel.get_roadmap_as_dict_for_update(roadmap_id)
-        db_roadmap = update_roadmap(roadmap, conversation)
-        RoadmapModel.replace_roadmap_by_id(roadmap_id, db_roadmap)
-
-    serialized_roadmap = {
+def serialize_roadmap(db_roadmap):
+    return {
         "id": str(db_roadmap["_id"]), 
         "menteeId": str(db_roadmap["menteeId"]),
         "status": db_roadmap["status"],
@@ -132,10 +152,148 @@ def create_roadmap(current_user):
         "created_at": db_roadmap["created_at"].isoformat(),
         "updated_at": db_roadmap["updated_at"].isoformat()
     }
+
+
+@ai_bp.route('/roadmap', methods=['POST'])
+@token_required
+def create_roadmap(current_user):
+    data = request.get_json()
+    conversation = data.get('conversation')
+    mentee_id = data.get('mentee_id')
+    if not conversation:
+        return jsonify({'message': 'conversation is required'}), 400
+    if not mentee_id:
+        return jsonify({'message': 'Mentee ID is required'}), 400
+    if not ObjectId.is_valid(mentee_id):
+        return jsonify({'message': 'Invalid mentee ID'}), 400
+
+    # Generation runs in worker.py; a repeat click while a job is pending reuses it
+    job = RoadmapJobModel.enqueue(current_user.get('_id'), mentee_id, conversation)
+
     return jsonify({
-        'message': 'Roadmap generated successfully',
-        'roadmap': serialized_roadmap 
-    }), 200
+        'message': 'Roadmap generation queued',
+        'job_id': str(job['_id']),
+        'status': job['status'],
+        'stream_url': f"/api/ai/roadmap/jobs/{job['_id']}/stream"
+    }), 202
+
+
+@ai_bp.route('/roadmap/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_roadmap_job(current_user, job_id):
+    job = RoadmapJobModel.get_job(job_id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    user_id = current_user.get('_id')
+    if user_id != job['mentorId'] and user_id != job['menteeId']:
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    payload = {
+        'job_id': str(job['_id']),
+        'status': job['status'],
+        'progress': job.get('progress', {}),
+        'attempts': job.get('attempts', 0),
+        'error': job.get('error'),
+        # The job also holds the id while running, but that roadmap may not exist until it is done
+        'roadmap_id': str(job['roadmap_id']) if job['status'] == 'done' and job.get('roadmap_id') else None
+    }
+    if job['status'] == 'done' and job.get('roadmap_id'):
+        db_roadmap = roadmaps.find_one({'_id': job['roadmap_id']})
+        if db_roadmap:
+            payload['roadmap'] = serialize_roadmap(db_roadmap)
+    return jsonify(payload), 200
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@ai_bp.route('/roadmap/jobs/<job_id>/stream', methods=['GET'])
+@token_required
+def stream_roadmap_job(current_user, job_id):
+    """Server-Sent Events feed of a roadmap job's checkpoints as the worker produces them"""
+    job = RoadmapJobModel.get_job(job_id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    user_id = current_user.get('_id')
+    if user_id != job['mentorId'] and user_id != job['menteeId']:
+        return jsonify({'message': 'Unauthorized'}), 403
+    # Mentees never see answer keys, same as the roadmap routes
+    include_evaluations = current_user.get('role') == 'mentor'
+
+    stream_key = str(user_id)
+    with _streams_lock:
+        if (_open_streams.get(stream_key, 0) >= ROADMAP_STREAMS_PER_USER
+                or sum(_open_streams.values()) >= ROADMAP_STREAM_MAX):
+            return jsonify({'message': 'Too many open progress streams, poll the job instead'}), 429
+        _open_streams[stream_key] = _open_streams.get(stream_key, 0) + 1
+
+    def events():
+        sent_outline = False
+        sent_resources = set()
+        sent_evaluations = set()
+        last_progress = None
+        last_write = time.monotonic()
+        deadline = time.monotonic() + ROADMAP_STREAM_TIMEOUT
+
+        while time.monotonic() < deadline:
+            state = RoadmapJobModel.get_job(job_id, include_partial=True)
+            if not state:
+                yield _sse('failed', {'error': 'Job not found'})
+                return
+            partial = state.get('partial') or {}
+            chunks = []
+
+            if not sent_outline and partial.get('outline'):
+                sent_outline = True
+                chunks.append(_sse('outline', {'modules': partial['outline']}))
+            for key, subtopics in sorted((partial.get('resources') or {}).items(), key=lambda kv: int(kv[0])):
+                if key not in sent_resources:
+                    sent_resources.add(key)
+                    chunks.append(_sse('module', {'index': int(key), 'subtopics': subtopics}))
+            if include_evaluations:
+                for key, evaluation in sorted((partial.get('evaluations') or {}).items(), key=lambda kv: int(kv[0])):
+                    if key not in sent_evaluations:
+                        sent_evaluations.add(key)
+                        chunks.append(_sse('evaluation', {'index': int(key), 'evaluation': evaluation}))
+            if state.get('progress') != last_progress:
+                last_progress = state.get('progress')
+                chunks.append(_sse('progress', last_progress))
+
+            if state['status'] == 'done':
+                chunks.append(_sse('done', {'roadmap_id': str(state['roadmap_id'])}))
+            elif state['status'] == 'failed':
+                chunks.append(_sse('failed', {'error': state.get('error')}))
+
+            if chunks:
+                last_write = time.monotonic()
+                yield ''.join(chunks)
+            elif time.monotonic() - last_write > 15:
+                # Comment line keeps proxies from closing an idle stream
+                last_write = time.monotonic()
+                yield ': keep-alive\n\n'
+
+            if state['status'] in ('done', 'failed'):
+                return
+            time.sleep(ROADMAP_STREAM_POLL)
+
+        yield _sse('timeout', {'job_id': job_id})
+
+    def release():
+        with _streams_lock:
+            remaining = _open_streams.pop(stream_key, 1) - 1
+            if remaining > 0:
+                _open_streams[stream_key] = remaining
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, even if the client left before
+    # the generator started
+    response.call_on_close(release)
+    return response
 
 
 
@@ -192,6 +350,10 @@ def interview(current_user):
         print("Interview API response:", response_payload)
         return jsonify(response_payload), 200
 
+    except CustomError as ce:
+        error_payload = {'message': ce.message}
+        print("Interview API response:", error_payload)
+        return jsonify(error_payload), ce.status_code
     except Exception as e:
         error_payload = {'message': f'Error during interview: {str(e)}'}
         print("Interview API response:", error_payload)
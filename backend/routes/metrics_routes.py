@@ -0,0 +1,30 @@
+import hmac
+import os
+from flask import Blueprint, jsonify, request
+from utils.gemini import get_pool_stats
+from utils import llm_cache, search_cache, single_flight, model_router, llm_resilience, llm_metrics, user_cache, jwt_utils
+from utils.llm_dispatcher import dispatcher
+from utils.password_hasher import hasher
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Shared secret for the operator's monitoring, sent as X-Metrics-Token; unset disables the endpoint
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+@metrics_bp.route('/', methods=['GET'])
+def get_metrics():
+    if not METRICS_TOKEN or not hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), METRICS_TOKEN):
+        return jsonify({'message': 'Metrics are not available'}), 403
+    return jsonify({
+        'llm_pool': get_pool_stats(),
+        'llm_cache': llm_cache.get_stats(),
+        'search_cache': search_cache.get_stats(),
+        'single_flight': single_flight.get_stats(),
+        'llm_dispatcher': dispatcher.get_stats(),
+        'llm_routes': model_router.get_stats(),
+        'llm_health': llm_resilience.get_stats(),
+        'llm_calls': llm_metrics.get_stats(),
+        'user_cache': user_cache.get_stats(),
+        'jwt_cache': jwt_utils.get_stats(),
+        'password_hashing': hasher.get_stats()
+    }), 200
@@ -6,8 +6,9 @@ from bson.errors import InvalidId
 from database.db import roadmaps, users, notifications
 from middleware.auth_middleware import token_required
 from services.ai_service import generate_roadmap
-from services.assessment_service import get_assessment, submit_score
+from services.assessment_service import EvaluationPending, get_assessment, submit_score
 from models.roadmap import RoadmapModel
+from utils.custom_error import CustomError
 
 roadmap_bp = Blueprint('roadmaps', __name__)
 
@@ -382,7 +383,12 @@ def get_mcq_assessment(current_user, roadmap_id, module_index):
     if user_id != mentor_id and user_id != mentee_id:
         return jsonify({"message": "Unauthorized"}), 403
     
-    questions = get_assessment(roadmap_id, module_index)
+    try:
+        questions = get_assessment(roadmap_id, module_index)
+    except EvaluationPending as ep:
+        return jsonify({"message": ep.message}), ep.status_code, {"Retry-After": str(ep.retry_after)}
+    except CustomError as ce:
+        return jsonify({"message": ce.message}), ce.status_code
     if questions is None:
         return jsonify({"message": "Assessment not found"}), 404
     
@@ -424,7 +430,12 @@ def submit_mcq_score(current_user, roadmap_id, module_index):
         return jsonify({"message": "Unauthorized"}), 403
     
     # Get the questions with correct answers
-    questions = get_assessment(roadmap_id, module_index)
+    try:
+        questions = get_assessment(roadmap_id, module_index)
+    except EvaluationPending as ep:
+        return jsonify({"message": ep.message}), ep.status_code, {"Retry-After": str(ep.retry_after)}
+    except CustomError as ce:
+        return jsonify({"message": ce.message}), ce.status_code
     if not questions:
         return jsonify({"message": "Assessment not found"}), 404
     
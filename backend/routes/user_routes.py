@@ -5,6 +5,9 @@ import datetime
 from database.db import users, notifications
 from middleware.auth_middleware import token_required
 from utils.serialization import fix_object_ids
+from services import matching_service
+from utils.skill_taxonomy import skill_ids
+from utils import user_cache
 
 user_bp = Blueprint('users', __name__)
 
@@ -26,6 +29,7 @@ def update_profile(current_user):
         update_data['profile.languages'] = data['languages']
     if 'skills' in data:
         update_data['profile.skills'] = data['skills']
+        update_data['profile.skill_ids'] = skill_ids(data['skills'])
     if 'experience_level' in data:
         update_data['profile.experience_level'] = data['experience_level']
     
@@ -34,6 +38,9 @@ def update_profile(current_user):
             {'_id': current_user['_id']},
             {'$set': update_data}
         )
+        user_cache.invalidate(current_user['_id'])
+        if current_user['role'] == 'mentor':
+            matching_service.on_user_saved(users.find_one({'_id': current_user['_id']}))
     
     return jsonify({'message': 'Profile updated successfully'}), 200
 
@@ -187,6 +194,7 @@ def accept_connection(current_user):
                 {'_id': ObjectId(notification['from_user_id'])},
                 {'$addToSet': {'connections.mentors': str(current_user['_id'])}}
             )
+        user_cache.invalidate(current_user['_id'], notification['from_user_id'])
         
         # Create notification for acceptance
         acceptance_notification = {
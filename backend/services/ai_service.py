@@ -1,36 +1,34 @@
-import os
 from dotenv import load_dotenv
 from typing import List, Optional
 from models.user import UserModel
 import json
 import re
-from utils.gemini import GeminiLLM
-from utils.roadmap_utils import create_roadmap, edit_roadmap
+from utils.model_router import get_llm_for
+from utils import llm_dispatcher, llm_metrics
+from services import matching_service
+from utils.custom_error import CustomError
+from utils.roadmap_utils import create_roadmap, edit_roadmap, plan_roadmap_edit
 from utils.audio_utils import transcribe, tts
 from utils.interview_utils import generate_next_question, fetch_feedback
 
 load_dotenv()
 
+# Mentor profiles change rarely; identical match prompts within this window reuse the answer
+MATCH_CACHE_TTL = 600
 
 
-def match_mentor_mentee(mentee_skills: List[str], mentee_experience: str) -> Optional[dict]:
+
+@llm_metrics.tagged("match_mentor_mentee")
+def match_mentor_mentee(mentee_skills: List[str], mentee_experience: str, mentee_languages: List[str] = None,
+                        mode: str = None) -> Optional[dict]:
+    if (mode or matching_service.MATCH_MODE) == "vector":
+        return matching_service.vector_match(mentee_skills)
     try:
-        mentors = UserModel.get_all_mentors()
-        if not mentors:
+        # Only the best keyword and TF-IDF matches go to the LLM so the prompt
+        # stays the same size however many mentors there are
+        mentor_profiles = matching_service.shortlist(mentee_skills, mentee_experience, mentee_languages)
+        if not mentor_profiles:
             return None
-        mentor_profiles = [
-            {
-                "id": str(m["_id"]),
-                "name": m.get("name"),
-                "email": m.get("email"),
-                "skills": m.get("profile", {}).get("skills", []),
-                "experience": m.get("profile", {}).get("experience", ""),
-                "mentoring_style": m.get("profile", {}).get("mentoring_style", ""),
-                "languages": m.get("profile", {}).get("languages", []),
-                "bio": m.get("profile", {}).get("bio", "")
-            }
-            for m in mentors
-        ]
 
         messages = [
             {
@@ -47,12 +45,14 @@ def match_mentor_mentee(mentee_skills: List[str], mentee_experience: str) -> Opt
                 )
             }
         ]
-        llm = GeminiLLM(api_key=os.getenv("GEMINI_API_KEY"))
-        response = llm.invoke(messages)
+        llm = get_llm_for("match")
+        response = llm.invoke(messages, cache_ttl=MATCH_CACHE_TTL, priority=llm_dispatcher.INTERACTIVE)
         match = re.search(r"MENTOR_ID:\s*([a-fA-F0-9]{24})\s*REASON:\s*(.+)", response.content, re.DOTALL)
+        llm_metrics.mark_parse(bool(match))
         if not match:
             print("Failed to parse mentor ID from Gemini response.")
             print(response.content)
+            llm.evict(messages)
             return None
 
         mentor_id = match.group(1).strip()
@@ -63,17 +63,22 @@ def match_mentor_mentee(mentee_skills: List[str], mentee_experience: str) -> Opt
             return {"mentor": mentor_id, "reason": reason}
         else:
             return None
+    except CustomError:
+        raise
     except Exception as e:
         print(e)
         return None
 
     
-def generate_roadmap(skill):
-    return create_roadmap(skill)
+def generate_roadmap(skill, on_progress=None, checkpoint=None):
+    return create_roadmap(skill, on_progress=on_progress, checkpoint=checkpoint)
 
 def update_roadmap(roadmap, conversation):
     return edit_roadmap(roadmap, conversation)
 
+def plan_roadmap_update(roadmap, conversation):
+    return plan_roadmap_edit(roadmap, conversation)
+
 def generate_interview_questions(audio_path, history_json, goal, theme):
     if audio_path is not None:
         user_answer = transcribe(audio_path)
@@ -1,12 +1,123 @@
+import os
+import threading
+from datetime import datetime, timedelta
 from database.db import roadmaps
 from bson.objectid import ObjectId
+from dotenv import load_dotenv
+from utils.model_router import get_llm_for
+from utils import llm_dispatcher, llm_metrics
+from utils.roadmap_utils import generate_module_evaluation
+from utils.custom_error import CustomError
+
+load_dotenv()
+
+# How long a request may hold the right to generate a module's MCQs before
+# another request is allowed to take over, and whether opening module N
+# warms module N+1 in the background.
+MCQ_CLAIM_SECONDS = int(os.getenv("MCQ_CLAIM_SECONDS", "90"))
+MCQ_PREFETCH = os.getenv("MCQ_PREFETCH", "True") == "True"
+# Seconds a client is told to wait before asking again while another request generates the MCQs
+MCQ_RETRY_AFTER = int(os.getenv("MCQ_RETRY_AFTER", "5"))
+
+
+class EvaluationPending(CustomError):
+    def __init__(self, retry_after=MCQ_RETRY_AFTER):
+        super().__init__("Assessment is being generated, please retry shortly", 202)
+        self.retry_after = retry_after
+
+
+def _stored_evaluation(oid, module_index):
+    """The module's persisted evaluation, or None"""
+    # A dotted "modules.N" projection does not select array element N, so project every
+    # module's evaluation and index into them
+    stored = roadmaps.find_one({'_id': oid}, {'modules.evaluation': 1})
+    modules = (stored or {}).get('modules') or []
+    if module_index >= len(modules):
+        return None
+    return modules[module_index].get('evaluation')
+
+
+@llm_metrics.tagged("ensure_evaluation")
+def ensure_evaluation(roadmap_id, module_index, priority=llm_dispatcher.INTERACTIVE):
+    """Return the module's evaluation, generating and persisting it exactly once.
+
+    None means the module does not exist and {} that generation failed.
+    Raises EvaluationPending while another request holds the claim, rather
+    than waiting for it.
+    """
+    module_index = int(module_index)
+    oid = ObjectId(roadmap_id)
+    eval_path = f"modules.{module_index}.evaluation"
+    claim_path = f"modules.{module_index}.evaluation_claimed_at"
+
+    roadmap = roadmaps.find_one({'_id': oid}, {'modules': 1})
+    if not roadmap or module_index >= len(roadmap.get('modules', [])):
+        return None
+    module = roadmap['modules'][module_index]
+    if module.get('evaluation'):
+        return module['evaluation']
+
+    # Only one request wins the claim and calls the LLM; the rest are told to come back
+    now = datetime.utcnow()
+    claimed = roadmaps.update_one(
+        {
+            '_id': oid,
+            eval_path: {'$in': [None, {}]},
+            claim_path: {'$not': {'$gt': now - timedelta(seconds=MCQ_CLAIM_SECONDS)}}
+        },
+        {'$set': {claim_path: now}}
+    )
+    if not claimed.modified_count:
+        # The claimant may have stored its result since the read above
+        evaluation = _stored_evaluation(oid, module_index)
+        if evaluation:
+            return evaluation
+        raise EvaluationPending()
+
+    subtopics = [s.get('title') if isinstance(s, dict) else s for s in module.get('subtopics', [])]
+    try:
+        evaluation = generate_module_evaluation(subtopics, get_llm_for("mcq"), priority)
+    except Exception:
+        roadmaps.update_one({'_id': oid}, {'$unset': {claim_path: ""}})
+        raise
+    if not evaluation:
+        roadmaps.update_one({'_id': oid}, {'$unset': {claim_path: ""}})
+        return {}
+
+    # Set-if-absent: a stale claimant finishing late must not overwrite a stored evaluation
+    roadmaps.update_one(
+        {'_id': oid, eval_path: {'$in': [None, {}]}},
+        {'$set': {eval_path: evaluation}}
+    )
+    roadmaps.update_one({'_id': oid}, {'$unset': {claim_path: ""}})
+    # Whoever stored first wins; return that so the questions match the answer key graded against
+    return _stored_evaluation(oid, module_index) or evaluation
+
+
+def _prefetch_evaluation(roadmap_id, module_index):
+    try:
+        ensure_evaluation(roadmap_id, module_index, priority=llm_dispatcher.BACKGROUND)
+    except EvaluationPending:
+        pass
+    except Exception as e:
+        print(f"Prefetching evaluation for module {module_index} failed: {e}")
+
 
 def get_assessment(roadmap_id, module_index):
-    roadmap = roadmaps.find_one({'_id': ObjectId(roadmap_id)})
+    roadmap = roadmaps.find_one({'_id': ObjectId(roadmap_id)}, {'modules.evaluation': 1})
     if not roadmap or int(module_index) >= len(roadmap.get('modules', [])):
         return None
-    module = roadmap['modules'][int(module_index)]
-    evaluation = module.get('evaluation', {})
+    module_count = len(roadmap['modules'])
+    evaluation = roadmap['modules'][int(module_index)].get('evaluation')
+    if not evaluation:
+        evaluation = ensure_evaluation(roadmap_id, module_index)
+        if evaluation is None:
+            return None
+
+    next_index = int(module_index) + 1
+    if MCQ_PREFETCH and next_index < module_count and not roadmap['modules'][next_index].get('evaluation'):
+        threading.Thread(target=llm_metrics.bind(_prefetch_evaluation), args=(roadmap_id, next_index), daemon=True).start()
+
     questions = []
     for key in sorted(evaluation.keys()):
         q = evaluation[key]
@@ -1,8 +1,11 @@
 from models.user import UserModel
 from werkzeug.security import generate_password_hash, check_password_hash
 from utils.custom_error import CustomError
+from services import matching_service
+from utils.skill_taxonomy import annotate_profile
+from utils.password_hasher import hasher, PASSWORD_HASH_ITERATIONS, LEGACY_ITERATIONS
 import secrets
-import hashlib
+import hmac
 
 class AuthService:
     @staticmethod
@@ -11,9 +14,19 @@ class AuthService:
         return secrets.token_hex(32)
 
     @staticmethod
-    def hash_password(salt, password):
-        """Hash password with salt"""
-        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
+    def hash_password(salt, password, iterations=PASSWORD_HASH_ITERATIONS):
+        """Hash password with salt in the password hashing pool"""
+        return hasher.hash(salt, password, iterations)
+
+    @staticmethod
+    def new_authentication(password):
+        """Salt, hash and work factor to store for a password"""
+        salt = AuthService.generate_salt()
+        return {
+            'password': AuthService.hash_password(salt, password),
+            'salt': salt,
+            'iterations': PASSWORD_HASH_ITERATIONS
+        }
 
     @staticmethod
     def login(email, password, role):
@@ -31,12 +44,21 @@ class AuthService:
         if user['role'] != role:
             raise CustomError("Invalid role for this user", 401)
 
-        # Verify password
-        expected_hash = AuthService.hash_password(user['authentication']['salt'], password)
+        # Verify password with the work factor it was hashed with
+        authentication = user['authentication']
+        iterations = authentication.get('iterations', LEGACY_ITERATIONS)
+        expected_hash = AuthService.hash_password(authentication['salt'], password, iterations)
 
-        if user['authentication']['password'] != expected_hash:
+        if not hmac.compare_digest(authentication['password'], expected_hash):
             raise CustomError("Invalid email or password", 401)
 
+        # Upgrade the stored hash to the current work factor
+        if iterations != PASSWORD_HASH_ITERATIONS:
+            try:
+                UserModel.update_user(str(user['_id']), {'authentication': AuthService.new_authentication(password)})
+            except CustomError as e:
+                print(f"Password rehash deferred: {e.message}")
+
         user_response_data = {
             '_id': str(user['_id']),
             'name': user['name'],
@@ -70,20 +92,13 @@ class AuthService:
         if existing_user:
             raise CustomError("User already exists with this email", 409)
 
-        # Generate salt and hash password
-        salt = AuthService.generate_salt()
-        password_hash = AuthService.hash_password(salt, password)
-
         # Prepare user data
         user_data = {
             'name': name,
             'username': username,
             'email': email,
             'role': role,
-            'authentication': {
-                'password': password_hash,
-                'salt': salt
-            }
+            'authentication': AuthService.new_authentication(password)
         }
 
         # Add profile data if provided
@@ -108,9 +123,12 @@ class AuthService:
                     'profile_picture': profile_data.get('profile_picture', ''),
                     'experience_level': profile_data.get('experience_level', 'beginner')
                 }
+            # Canonical skill IDs next to the raw strings, for matching and analytics
+            annotate_profile(user_data['profile'])
 
         # Create user
         created_db_user = UserModel.create_user(user_data)
+        matching_service.on_user_saved(created_db_user)
 
         # Prepare API-ready user data
         user_response = {
@@ -0,0 +1,126 @@
+import os
+import time
+from itertools import zip_longest
+from typing import List, Optional
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+from models.user import UserModel
+from utils import mentor_index, mentor_vectors
+from utils.assignment import auction_assign
+from utils.custom_error import CustomError
+
+load_dotenv()
+
+# "llm" asks Gemini to pick from a shortlist; "vector" returns the most
+# similar mentor by TF-IDF score without any LLM call.
+MATCH_MODES = ("llm", "vector")
+MATCH_MODE = os.getenv("MATCH_MODE", "llm")
+
+# Cohort matching: mentees a mentor takes unless their profile sets
+# max_mentees, and how many best-scoring mentors each mentee may go to.
+MENTOR_CAPACITY = int(os.getenv("MENTOR_CAPACITY", "5"))
+COHORT_CANDIDATES = int(os.getenv("COHORT_CANDIDATES", "50"))
+
+
+def on_user_saved(user):
+    """Refresh the mentor indexes after a register or profile update."""
+    mentor_index.on_user_saved(user)
+    mentor_vectors.on_user_saved(user)
+
+
+def shortlist(goals: List[str], experience_level: str = "", languages: List[str] = None,
+              k: int = mentor_index.MATCH_SHORTLIST_SIZE) -> list:
+    """Mentor summaries for the match prompt: keyword and TF-IDF matches interleaved."""
+    index = mentor_index.get_index()
+    keyword = [m["id"] for m in index.shortlist(goals, experience_level, languages, k)]
+    try:
+        similar = [mentor_id for mentor_id, _ in mentor_vectors.get_vectors().top(goals, k)]
+    except Exception as e:
+        print(f"Mentor vector lookup failed: {e}")
+        similar = []
+
+    chosen = []
+    seen = set()
+    for pair in zip_longest(similar, keyword):
+        for mentor_id in pair:
+            summary = index.get(mentor_id) if mentor_id else None
+            if summary and mentor_id not in seen:
+                seen.add(mentor_id)
+                chosen.append(summary)
+    return chosen[:k]
+
+
+def vector_match(goals: List[str]) -> Optional[dict]:
+    """The most similar mentor and the shared terms that made them so."""
+    vectors = mentor_vectors.get_vectors()
+    for mentor_id, score in vectors.top(goals, 5):
+        # The index may predate a deleted or demoted mentor
+        mentor = UserModel.get_user_by_id(mentor_id)
+        if mentor and mentor.get("role") == "mentor":
+            terms = vectors.shared_terms(mentor_id, goals)
+            return {
+                "mentor": mentor_id,
+                "reason": f"Closest profile match (similarity {score:.2f}) on: {', '.join(terms)}"
+            }
+    return None
+
+
+def match_cohort(mentee_ids: List[str] = None, default_capacity: int = None,
+                 candidates: int = None, commit: bool = True) -> dict:
+    """Match many mentees at once without the LLM.
+
+    Scores every mentee against every mentor by TF-IDF similarity, keeps each
+    mentee's best candidates, and assigns them so that no mentor goes over
+    capacity (profile.max_mentees, else MENTOR_CAPACITY, minus the mentees
+    they already have). With commit, all links are written in one bulk_write.
+    Without mentee_ids, every mentee who has no mentor yet is matched; given
+    mentees who already have one are left alone and listed in already_matched.
+    """
+    invalid = [m for m in mentee_ids or [] if not ObjectId.is_valid(m)]
+    if invalid:
+        raise CustomError(f"Invalid mentee id: {', '.join(map(str, invalid))}", 400)
+    started = time.monotonic()
+    default_capacity = MENTOR_CAPACITY if default_capacity is None else default_capacity
+    mentees = UserModel.get_mentees_for_matching(mentee_ids)
+    already_matched = [str(m["_id"]) for m in mentees if m.get("mentors")]
+    mentees = [m for m in mentees if not m.get("mentors")]
+    vectors = mentor_vectors.get_vectors()
+
+    capacity = {}
+    for mentor_id, (max_mentees, current) in UserModel.get_mentor_loads().items():
+        limit = max_mentees if isinstance(max_mentees, int) else default_capacity
+        capacity[mentor_id] = max(0, limit - current)
+
+    rows, scores = vectors.top_many(
+        [m.get("profile", {}).get("goals", []) for m in mentees],
+        COHORT_CANDIDATES if candidates is None else candidates
+    )
+    options = [
+        [(vectors.mentor_ids[j], float(s)) for j, s in zip(row, row_scores) if s > 0]
+        for row, row_scores in zip(rows, scores)
+    ]
+    chosen = auction_assign(options, capacity)
+
+    assigned, unassigned = [], []
+    for mentee, mentor_id, mentee_options in zip(mentees, chosen, options):
+        if mentor_id is None:
+            unassigned.append(str(mentee["_id"]))
+        else:
+            score = next(s for m_id, s in mentee_options if m_id == mentor_id)
+            assigned.append({"mentee": str(mentee["_id"]), "mentor": mentor_id, "score": round(score, 4)})
+
+    if commit and assigned:
+        UserModel.link_many([(a["mentor"], a["mentee"]) for a in assigned])
+
+    return {
+        "assigned": assigned,
+        "unassigned": unassigned,
+        "already_matched": already_matched,
+        "stats": {
+            "mentees": len(mentees),
+            "mentors_with_capacity": sum(1 for c in capacity.values() if c > 0),
+            "total_score": round(sum(a["score"] for a in assigned), 4),
+            "committed": commit and bool(assigned),
+            "seconds": round(time.monotonic() - started, 3)
+        }
+    }
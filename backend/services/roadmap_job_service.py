@@ -0,0 +1,160 @@
+import os
+import threading
+import traceback
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+from models.user import UserModel
+from models.roadmap import RoadmapModel
+from models.roadmap_job import RoadmapJobModel
+from services.ai_service import generate_roadmap, update_roadmap, plan_roadmap_update
+from utils.roadmap_utils import RoadmapCheckpoint
+from utils import llm_metrics
+
+load_dotenv()
+
+JOB_LEASE_SECONDS = int(os.getenv("ROADMAP_JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("ROADMAP_JOB_MAX_ATTEMPTS", "3"))
+# A failed attempt is retried after this many seconds, doubling with each attempt
+JOB_RETRY_BACKOFF = float(os.getenv("ROADMAP_JOB_RETRY_BACKOFF", "30"))
+# "patch" applies LLM-planned changes in place; "full" has the LLM rewrite the whole roadmap
+ROADMAP_EDIT_MODE = os.getenv("ROADMAP_EDIT_MODE", "patch")
+
+
+class JobCancelled(Exception):
+    """The job's lease has passed to another worker, which now owns its state."""
+
+
+def ensure_active(cancelled):
+    if cancelled is not None and cancelled.is_set():
+        raise JobCancelled()
+
+
+class JobCheckpoint(RoadmapCheckpoint):
+    """Checkpoint persisted into the job's partial document after every stage.
+
+    Saving stops the build with JobCancelled once cancelled is set.
+    """
+
+    def __init__(self, job, worker_id, cancelled=None):
+        partial = job.get('partial') or {}
+        super().__init__(partial.get('outline'), partial.get('resources'), partial.get('evaluations'))
+        self.job_id = str(job['_id'])
+        self.worker_id = worker_id
+        self.cancelled = cancelled
+
+    def save_outline(self, modules):
+        ensure_active(self.cancelled)
+        super().save_outline(modules)
+        RoadmapJobModel.save_checkpoint(self.job_id, self.worker_id, 'outline', modules)
+
+    def save_resources(self, module_index, subtopics):
+        ensure_active(self.cancelled)
+        super().save_resources(module_index, subtopics)
+        RoadmapJobModel.save_checkpoint(self.job_id, self.worker_id, f'resources.{module_index}', subtopics)
+
+    def save_evaluation(self, module_index, evaluation):
+        ensure_active(self.cancelled)
+        super().save_evaluation(module_index, evaluation)
+        RoadmapJobModel.save_checkpoint(self.job_id, self.worker_id, f'evaluations.{module_index}', evaluation)
+
+
+def build_roadmap(mentor_id, mentee_id, conversation, on_progress=None, checkpoint=None,
+                  job=None, cancelled=None) -> dict:
+    """Create the mentee's roadmap, or edit the existing one, and persist it.
+
+    Given a job with its mode and roadmap_id recorded, every step is safe to
+    repeat: the roadmap is created under that id, linking is a plain set, and
+    an edit the job already applied is skipped. cancelled is checked before
+    each write.
+    """
+    if job is not None:
+        mode, roadmap_id, job_id = job['mode'], job['roadmap_id'], job['_id']
+    else:
+        roadmap_id = UserModel.get_user_roadmap_id(mentee_id)
+        mode, job_id = ("edit" if roadmap_id else "create"), None
+
+    if mode == "create":
+        db_roadmap = RoadmapModel.get_roadmap_by_id(roadmap_id) if roadmap_id else None
+        if db_roadmap is None:
+            modules_content = generate_roadmap(conversation, on_progress=on_progress, checkpoint=checkpoint)
+            ensure_active(cancelled)
+            db_roadmap = RoadmapModel.create_roadmap(
+                mentee_id=mentee_id,
+                mentor_id=str(mentor_id),
+                duration_weeks=8,
+                modules=modules_content,
+                roadmap_id=roadmap_id
+            )
+        if not db_roadmap:
+            raise RuntimeError("Failed to create roadmap in database")
+        ensure_active(cancelled)
+        UserModel.add_roadmap_id_to_user(mentee_id, db_roadmap['_id'])
+    else:
+        if on_progress:
+            on_progress("editing", 0, 0)
+        current = RoadmapModel.get_roadmap_by_id(roadmap_id)
+        if job_id is not None and current and current.get('last_edit_job') == job_id:
+            return current
+        roadmap = RoadmapModel.get_roadmap_as_dict_for_update(roadmap_id)
+        if ROADMAP_EDIT_MODE == "full":
+            db_roadmap = update_roadmap(roadmap, conversation)
+            ensure_active(cancelled)
+            RoadmapModel.replace_roadmap_by_id(roadmap_id, db_roadmap, job_id=job_id)
+        else:
+            patch = plan_roadmap_update(roadmap, conversation)
+            ensure_active(cancelled)
+            RoadmapModel.apply_patch(roadmap_id, patch, job_id=job_id)
+            db_roadmap = RoadmapModel.get_roadmap_by_id(roadmap_id)
+
+    return db_roadmap
+
+
+def run_job(job, worker_id):
+    """Execute one claimed job, keeping its lease alive until it finishes.
+
+    If the lease is lost the job stops at its next checkpoint and leaves the
+    job document to the worker that took it over.
+    """
+    job_id = str(job['_id'])
+    stop = threading.Event()
+    cancelled = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(JOB_LEASE_SECONDS / 3):
+            if not RoadmapJobModel.heartbeat(job_id, worker_id, JOB_LEASE_SECONDS):
+                print(f"Lost lease on roadmap job {job_id}, stopping it")
+                cancelled.set()
+                return
+
+    def on_progress(stage, modules_done, modules_total):
+        ensure_active(cancelled)
+        RoadmapJobModel.set_progress(job_id, worker_id, stage, modules_done, modules_total)
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        if job.get('mode'):
+            print(f"Resuming roadmap job {job_id} ({job['mode']} {job['roadmap_id']})")
+        else:
+            existing = UserModel.get_user_roadmap_id(str(job['menteeId']))
+            job['mode'] = "edit" if existing else "create"
+            job['roadmap_id'] = ObjectId(existing) if existing else ObjectId()
+            if not RoadmapJobModel.set_target(job_id, worker_id, job['mode'], job['roadmap_id']):
+                raise JobCancelled()
+        checkpoint = JobCheckpoint(job, worker_id, cancelled)
+        with llm_metrics.tagged(endpoint="worker.roadmap_job"):
+            db_roadmap = build_roadmap(job['mentorId'], str(job['menteeId']), job['conversation'],
+                                       on_progress, checkpoint, job=job, cancelled=cancelled)
+        ensure_active(cancelled)
+        RoadmapJobModel.complete(job_id, worker_id, db_roadmap['_id'])
+    except JobCancelled:
+        print(f"Roadmap job {job_id} was taken over by another worker")
+    except Exception as e:
+        traceback.print_exc()
+        attempts = job.get('attempts', 1)
+        retry = attempts < JOB_MAX_ATTEMPTS
+        RoadmapJobModel.fail(job_id, worker_id, str(e), retry=retry,
+                             retry_in=JOB_RETRY_BACKOFF * 2 ** (attempts - 1))
+    finally:
+        stop.set()
+        beat.join()
@@ -0,0 +1,27 @@
+import pytest
+
+from utils.search_cache import make_key, normalize_query
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Hadoop basics", "Spark basics"),
+    ("GitHub Actions tutorial", "Git tutorial"),
+    ("Unix shell scripting", "Linux shell scripting"),
+    ("image processing course", "computer vision course"),
+    ("Django security", "Django cybersecurity"),
+])
+def test_distinct_skills_get_distinct_keys(a, b):
+    assert make_key(a) != make_key(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("React  Hooks tutorial", "react hooks tutorial"),
+    ("the basics of Node.js", "basics node.js"),
+    ("Machine-Learning tutorial", "machine learning tutorial"),
+])
+def test_surface_differences_share_a_key(a, b):
+    assert make_key(a) == make_key(b)
+
+
+def test_site_filter_is_kept_verbatim():
+    assert normalize_query("Python tutorial site:youtube.com") == "python tutorial site:youtube.com"
@@ -0,0 +1,52 @@
+import heapq
+from collections import deque
+
+
+def auction_assign(candidates, capacity, epsilon=1e-2) -> list:
+    """Capacity-constrained assignment maximising the total score.
+
+    candidates[i] is a list of (item, score) pairs bidder i may take and
+    capacity maps each item to its free slots. Uses the auction algorithm
+    for similar objects: unassigned bidders bid for their best item net of
+    price, a full item keeps its highest bids and its price rises to the
+    lowest bid it kept. Staying unassigned is worth 0, so bidders with no
+    positive net score drop out. The total is within len(candidates) *
+    epsilon of optimal.
+
+    Returns the item assigned to each bidder, or None.
+    """
+    # Prices never go negative, so once a score drops to the second best net
+    # value no later (lower-scored) candidate can change the bid
+    options = [
+        sorted(((item, score) for item, score in pairs if capacity.get(item, 0) > 0 and score > 0),
+               key=lambda pair: -pair[1])
+        for pairs in candidates
+    ]
+    prices = {}
+    holders = {}  # item -> min-heap of (bid, bidder)
+    assigned = [None] * len(options)
+    queue = deque(i for i, pairs in enumerate(options) if pairs)
+    while queue:
+        bidder = queue.popleft()
+        best_item, best, second = None, 0.0, 0.0
+        for item, score in options[bidder]:
+            if score <= second:
+                break
+            net = score - prices.get(item, 0.0)
+            if net > best:
+                best_item, best, second = item, net, best
+            elif net > second:
+                second = net
+        if best_item is None:
+            continue
+
+        heap = holders.setdefault(best_item, [])
+        heapq.heappush(heap, (prices.get(best_item, 0.0) + best - second + epsilon, bidder))
+        assigned[bidder] = best_item
+        if len(heap) > capacity[best_item]:
+            _, outbid = heapq.heappop(heap)
+            assigned[outbid] = None
+            queue.append(outbid)
+        if len(heap) == capacity[best_item]:
+            prices[best_item] = heap[0][0]
+    return assigned
@@ -2,12 +2,13 @@ import assemblyai as aai
 from dotenv import load_dotenv
 import os
 from gtts import gTTS
+from utils import backends
 
 load_dotenv()
 
 aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
 
-def transcribe(audio_file):
+def _assemblyai_transcribe(audio_file):
     transcript = aai.Transcriber().transcribe(audio_file)
 
     if transcript.status == "error":
@@ -15,6 +16,12 @@ def transcribe(audio_file):
 
     return transcript.text
 
-def tts(text):
+def _gtts_save(text):
     tts = gTTS(text)
     tts.save('ai-speech.mp3')
+
+def transcribe(audio_file):
+    return backends.transcribe(audio_file, _assemblyai_transcribe)
+
+def tts(text):
+    backends.tts(text, 'ai-speech.mp3', _gtts_save)
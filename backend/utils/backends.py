@@ -0,0 +1,241 @@
+"""Pluggable backends for the paid external APIs (Gemini, Serper, AssemblyAI/gTTS).
+
+Each service runs in one of four modes, chosen by EXTERNAL_BACKEND or a
+per-service override (GEMINI_BACKEND, SERPER_BACKEND, AUDIO_BACKEND):
+
+- live:      call the real API (default)
+- record:    call the real API and save every response under BACKEND_RECORDINGS_DIR
+- replay:    serve saved responses only; a request that was never recorded fails
+- synthetic: return schema-valid fake payloads after a simulated delay
+
+Synthetic latency is set with SYNTHETIC_LATENCY (or <SERVICE>_SYNTHETIC_LATENCY)
+as "fixed:<ms>", "uniform:<lo_ms>,<hi_ms>" or "lognormal:<median_ms>,<sigma>",
+and failures with SYNTHETIC_ERROR_RATE (or <SERVICE>_SYNTHETIC_ERROR_RATE).
+Set SYNTHETIC_SEED for a reproducible sequence.
+"""
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODES = ("live", "record", "replay", "synthetic")
+RECORDINGS_DIR = os.getenv("BACKEND_RECORDINGS_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "recordings"))
+
+_rng = random.Random(os.getenv("SYNTHETIC_SEED"))
+_rng_lock = threading.Lock()
+
+
+class BackendError(RuntimeError):
+    """Raised for replay misses and injected synthetic failures."""
+
+
+def mode_for(service: str) -> str:
+    mode = os.getenv(f"{service.upper()}_BACKEND") or os.getenv("EXTERNAL_BACKEND", "live")
+    if mode not in MODES:
+        raise ValueError(f"Unknown backend mode '{mode}' for {service}; expected one of {MODES}")
+    return mode
+
+
+def _setting(service: str, name: str, default: str) -> str:
+    return os.getenv(f"{service.upper()}_{name}") or os.getenv(name, default)
+
+
+def _random(fn, *args):
+    with _rng_lock:
+        return fn(*args)
+
+
+def synthetic_delay(service: str):
+    """Sleep for one sample of the service's latency distribution."""
+    spec = _setting(service, "SYNTHETIC_LATENCY", "fixed:0")
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        ms = values[0] if values else 0
+    elif kind == "uniform":
+        ms = _random(_rng.uniform, values[0], values[1])
+    elif kind == "lognormal":
+        ms = _random(_rng.lognormvariate, math.log(values[0]), values[1] if len(values) > 1 else 0.5)
+    else:
+        raise ValueError(f"Unknown latency distribution '{spec}'")
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+def synthetic_failure(service: str) -> bool:
+    rate = float(_setting(service, "SYNTHETIC_ERROR_RATE", "0"))
+    return rate > 0 and _random(_rng.random) < rate
+
+
+def _path(service: str, request) -> str:
+    digest = hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return os.path.join(RECORDINGS_DIR, service, f"{digest}.json")
+
+
+def _save(service: str, request, response):
+    path = _path(service, request)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"service": service, "request": request, "response": response}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _load(service: str, request):
+    path = _path(service, request)
+    if not os.path.exists(path):
+        raise BackendError(f"No {service} recording for this request ({os.path.basename(path)})")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["response"]
+
+
+def run(service: str, request, live, synthetic):
+    """Dispatch one call: live() for the real API, synthetic() for a fake payload.
+
+    Both must return JSON-serializable values so they can be recorded.
+    """
+    mode = mode_for(service)
+    if mode == "live":
+        return live()
+    if mode == "record":
+        response = live()
+        _save(service, request, response)
+        return response
+    if mode == "replay":
+        return _load(service, request)
+    synthetic_delay(service)
+    if synthetic_failure(service):
+        raise BackendError(f"Synthetic {service} failure")
+    return synthetic()
+
+
+# --- Gemini ---------------------------------------------------------------
+
+class _Text:
+    def __init__(self, text):
+        self.text = text
+
+
+class BackendModel:
+    """Stands in for genai.GenerativeModel when Gemini is not in live mode."""
+
+    def __init__(self, model_name, model):
+        self.model_name = model_name
+        self.model = model
+
+    def generate_content(self, prompt, stream=False):
+        text = run(
+            "gemini",
+            {"model": self.model_name, "prompt": prompt},
+            live=lambda: self.model.generate_content(prompt).text,
+            synthetic=lambda: synthetic_gemini_text(prompt)
+        )
+        if not stream:
+            return _Text(text)
+        # Replay in a few pieces so streaming parsers see realistic chunking
+        size = max(1, len(text) // 8)
+        return iter([_Text(text[i:i + size]) for i in range(0, len(text), size)])
+
+
+def wrap_gemini(model_name, model):
+    return model if mode_for("gemini") == "live" else BackendModel(model_name, model)
+
+
+def synthetic_gemini_text(prompt: str) -> str:
+    """A plausible response for each prompt shape the app sends."""
+    seed = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    if '"modify_modules"' in prompt:
+        return json.dumps({"modify_modules": [], "remove_modules": [], "add_modules": []})
+    if '"subtopics"' in prompt and "modules" in prompt:
+        modules = [
+            {
+                "title": f"Module {i + 1}",
+                "objective": f"Understand part {i + 1} of the topic",
+                "subtopics": [f"Concept {i + 1}.{j + 1}" for j in range(4)]
+            }
+            for i in range(6 + seed % 3)
+        ]
+        return "```json\n" + json.dumps(modules, indent=2) + "\n```"
+    if "multiple-choice questions" in prompt:
+        questions = {
+            f"question{n}": {
+                "question": f"Synthetic question {n}?",
+                "option A": "First answer",
+                "option B": "Second answer",
+                "option C": "Third answer",
+                "option D": "Fourth answer",
+                "correct option": "ABCD"[(seed + n) % 4]
+            }
+            for n in range(1, 6)
+        }
+        return "```json\n" + json.dumps(questions, indent=2) + "\n```"
+    if "MENTOR_ID:" in prompt:
+        ids = re.findall(r'"id": "([a-fA-F0-9]{24})"', prompt)
+        mentor_id = ids[seed % len(ids)] if ids else "0" * 24
+        return f"MENTOR_ID: {mentor_id}\nREASON: Their skills closely match the mentee's goals."
+    if "feeback" in prompt or "feedback" in prompt:
+        return "The candidate communicates clearly and knows the fundamentals; they should practise applying them to larger problems."
+    return "Can you walk me through a project where you applied this?"
+
+
+# --- Serper ---------------------------------------------------------------
+
+def serper_search(query: str, live):
+    """Returns (status_code, body) where live() performs the real request."""
+    def synthetic():
+        slug = hashlib.md5(query.encode("utf-8")).hexdigest()[:11]
+        return [200, {"organic": [
+            {"title": f"{query.split(' site:')[0]} - video lesson", "link": f"https://www.youtube.com/watch?v={slug}"},
+            {"title": f"{query.split(' site:')[0]} - course", "link": f"https://www.coursera.org/learn/{slug}"},
+            {"title": f"{query.split(' site:')[0]} - tutorial", "link": f"https://example.org/{slug}"}
+        ]}]
+
+    try:
+        status, body = run("serper", {"q": query}, live=lambda: list(live()), synthetic=synthetic)
+    except BackendError as e:
+        if mode_for("serper") != "synthetic":
+            raise
+        print(e)
+        return 503, None
+    return status, body
+
+
+# --- AssemblyAI / gTTS ----------------------------------------------------
+
+def transcribe(audio_file, live):
+    if mode_for("audio") == "live":
+        return live(audio_file)
+    with open(audio_file, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return run(
+        "audio",
+        {"op": "transcribe", "audio_sha256": digest},
+        live=lambda: live(audio_file),
+        synthetic=lambda: "I have been learning this topic for a few months and built a small project with it."
+    )
+
+
+def tts(text, path, live):
+    """Writes speech for text to path; recordings keep the audio bytes."""
+    mode = mode_for("audio")
+    if mode == "live":
+        live(text)
+        return
+
+    def record_live():
+        live(text)
+        with open(path, "rb") as f:
+            return base64.b64encode(f.read()).decode("ascii")
+
+    audio = run("audio", {"op": "tts", "text": text}, live=record_live, synthetic=lambda: None)
+    if mode == "replay" and audio:
+        with open(path, "wb") as f:
+            f.write(base64.b64decode(audio))
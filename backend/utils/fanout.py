@@ -0,0 +1,42 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "8"))
+
+
+def fan_out(fn, items, max_workers: int = None, on_result=None) -> list:
+    """Call fn on every item concurrently and return results in input order.
+
+    on_result(index, result), if given, is called from the calling thread as
+    each item finishes, in completion order. If any call raises, the first
+    exception is re-raised once all items have finished.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = min(max_workers or FANOUT_MAX_WORKERS, len(items))
+    results = [None] * len(items)
+    if workers <= 1:
+        for i, item in enumerate(items):
+            results[i] = fn(item)
+            if on_result:
+                on_result(i, results[i])
+        return results
+    error = None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fn, item): i for i, item in enumerate(items)}
+        for future in as_completed(futures):
+            i = futures[future]
+            # Let the remaining items finish (and be reported) before raising
+            if future.exception() is not None:
+                error = error or future.exception()
+                continue
+            results[i] = future.result()
+            if on_result:
+                on_result(i, results[i])
+    if error is not None:
+        raise error
+    return results
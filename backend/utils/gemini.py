@@ -1,11 +1,261 @@
+import os
+import threading
+import time
 import google.generativeai as genai
+from dotenv import load_dotenv
+from utils import llm_cache, single_flight, backends, llm_dispatcher, llm_resilience, llm_metrics
+
+load_dotenv()
+
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
 
 class GeminiLLM:
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+    def __init__(self, api_key: str = None, model_name: str = DEFAULT_MODEL, configure: bool = True):
+        if configure:
+            genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = backends.wrap_gemini(model_name, genai.GenerativeModel(model_name))
+
+    def invoke(self, messages, cache_ttl: float = None, priority: str = llm_dispatcher.BACKGROUND,
+               deadline: float = None, degraded: str = None):
+        """Run the prompt; callers opt into response caching by passing cache_ttl seconds.
+
+        Identical prompts already in flight share one upstream call, which is
+        admitted by the LLM dispatcher at the given priority, must finish
+        within deadline seconds and is hedged with a duplicate when slow.
+        While the model's circuit breaker is open a cached answer is returned
+        if there is one, else `degraded` if given, else LLMUnavailable.
+        """
+        started = time.monotonic()
+        prompt = "\n".join([m['content'] for m in messages])
+        key = llm_cache.make_key(self.model_name, messages)
+        if cache_ttl:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                llm_metrics.record(self.model_name, started, prompt, cached, cached=True)
+                return _response(cached)
+
+        health = llm_resilience.health_for(self.model_name)
+        queue_wait = [0.0]
+        # Stays False for in-process followers and answers taken from another worker
+        called = [False]
+
+        def call():
+            called[0] = True
+            tokens = llm_dispatcher.estimate_tokens(prompt)
+            queue_wait[0] = llm_dispatcher.dispatcher.acquire(priority, tokens)
+            text = health.call(
+                lambda: self.model.generate_content(prompt).text,
+                deadline=deadline,
+                can_hedge=lambda: llm_dispatcher.dispatcher.try_acquire(priority, tokens)
+            )
+            if cache_ttl:
+                llm_cache.put(key, text, cache_ttl, model_name=self.model_name)
+            return text
 
-    def invoke(self, messages):
+        lookup = (lambda: llm_cache.get(key)) if cache_ttl else None
+        # Followers wait no longer than the leader itself can take, including
+        # its wait on another worker's lease before calling the model
+        wait = llm_dispatcher.DEADLINES[priority] + (llm_resilience.LLM_CALL_DEADLINE if deadline is None else deadline)
+        if lookup is not None:
+            wait += single_flight.remote_wait_budget()
+        try:
+            text = single_flight.shared_call(f"llm:{key}", call, lookup, timeout=wait)
+        except llm_resilience.LLMUnavailable as e:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                llm_metrics.record(self.model_name, started, prompt, cached, cached=True)
+                return _response(cached)
+            if degraded is not None:
+                llm_metrics.record(self.model_name, started, prompt, degraded, error=e, coalesced=not called[0])
+                return _response(degraded)
+            llm_metrics.record(self.model_name, started, prompt, error=e, coalesced=not called[0])
+            raise
+        except Exception as e:
+            llm_metrics.record(self.model_name, started, prompt, error=e, coalesced=not called[0])
+            raise
+        llm_metrics.record(self.model_name, started, prompt, text, queue_wait=queue_wait[0],
+                           coalesced=not called[0])
+        return _response(text)
+
+    def stream(self, messages, cache_ttl: float = None, priority: str = llm_dispatcher.BACKGROUND,
+               first_chunk_deadline: float = None, deadline: float = None):
+        """Yield response text chunks as Gemini produces them.
+
+        A consumer may stop early (e.g. once it has a complete JSON value);
+        what was received so far is still cached when cache_ttl is given.
+        Concurrent identical prompts wait for the leading stream and get its
+        text as a single chunk. The first chunk must arrive within
+        first_chunk_deadline and the whole stream within deadline seconds
+        (LLM_STREAM_FIRST_CHUNK_DEADLINE / LLM_STREAM_DEADLINE by default),
+        else LLMTimeout.
+        """
+        started = time.monotonic()
         prompt = "\n".join([m['content'] for m in messages])
-        response = self.model.generate_content(prompt)
-        return type("LLMResponse", (), {"content": response.text})
+        key = llm_cache.make_key(self.model_name, messages)
+        if cache_ttl:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                llm_metrics.record(self.model_name, started, prompt, cached, cached=True)
+                yield cached
+                return
+
+        flight_key = f"llm:{key}"
+        leader, call = single_flight.group.begin(flight_key)
+        if not leader:
+            wait = llm_dispatcher.DEADLINES[priority] + (
+                llm_resilience.LLM_STREAM_DEADLINE if deadline is None else deadline)
+            if cache_ttl:
+                wait += single_flight.remote_wait_budget()
+            try:
+                text = call.wait(wait)
+            except single_flight.FlightTimeout as e:
+                llm_metrics.record(self.model_name, started, prompt, error=e, coalesced=True)
+                raise llm_resilience.LLMTimeout(self.model_name, wait)
+            except Exception as e:
+                llm_metrics.record(self.model_name, started, prompt, error=e, coalesced=True)
+                raise
+            llm_metrics.record(self.model_name, started, prompt, text, coalesced=True)
+            yield text
+            return
+
+        parts = []
+        received = False
+        error = None
+        leased = False
+        remote = False
+        queue_wait = 0.0
+        try:
+            if cache_ttl and single_flight.SINGLE_FLIGHT_DISTRIBUTED:
+                leased = single_flight.acquire_lease(flight_key)
+                if not leased:
+                    text = single_flight.wait_for_remote(flight_key, lambda: llm_cache.get(key))
+                    if text is not None:
+                        parts.append(text)
+                        received = remote = True
+                        yield text
+                        return
+
+            queue_wait = llm_dispatcher.dispatcher.acquire(priority, llm_dispatcher.estimate_tokens(prompt))
+            health = llm_resilience.health_for(self.model_name)
+            if not health.breaker.allow():
+                cached = llm_cache.get(key)
+                if cached is None:
+                    raise llm_resilience.LLMUnavailable(self.model_name)
+                parts.append(cached)
+                received = remote = True
+                yield cached
+                return
+            chunks = health.stream(
+                lambda: (chunk.text for chunk in self.model.generate_content(prompt, stream=True)),
+                first_chunk_deadline=first_chunk_deadline,
+                deadline=deadline
+            )
+            try:
+                for text in chunks:
+                    parts.append(text)
+                    yield text
+            finally:
+                chunks.close()
+            received = True
+        except GeneratorExit:
+            received = True
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            llm_metrics.record(
+                self.model_name, started, prompt, "".join(parts),
+                error=None if received else error or RuntimeError("LLM stream ended without a response"),
+                cached=remote, queue_wait=queue_wait
+            )
+            if cache_ttl and received and parts and not remote:
+                llm_cache.put(key, "".join(parts), cache_ttl, model_name=self.model_name)
+            if leased:
+                single_flight.release_lease(flight_key)
+            if received:
+                single_flight.group.finish(flight_key, call, result="".join(parts))
+            else:
+                single_flight.group.finish(flight_key, call, error=error or RuntimeError("LLM stream ended without a response"))
+
+    def evict(self, messages):
+        llm_cache.evict(llm_cache.make_key(self.model_name, messages))
+
+
+def _response(text):
+    return type("LLMResponse", (), {"content": text})
+
+
+# Process-wide client registry: one configured GenerativeModel per model name
+# per worker process. gunicorn forks workers after import, so the registry is
+# keyed by pid and rebuilt in a child rather than sharing the parent's channel.
+_lock = threading.Lock()
+_clients = {}
+_pid = None
+_configured = False
+_stats = {"created": 0, "reused": 0, "resets": 0}
+
+
+def _reset_after_fork():
+    global _clients, _pid, _configured
+    if _pid is not None:
+        _stats["resets"] += 1
+    _clients = {}
+    _configured = False
+    _pid = os.getpid()
+
+
+def get_llm(model_name: str = DEFAULT_MODEL) -> GeminiLLM:
+    """Return the shared GeminiLLM for this worker, creating it on first use."""
+    global _configured
+    if _pid == os.getpid():
+        client = _clients.get(model_name)
+        if client is not None:
+            with _lock:
+                _stats["reused"] += 1
+            return client
+
+    with _lock:
+        if _pid != os.getpid():
+            _reset_after_fork()
+        client = _clients.get(model_name)
+        if client is not None:
+            _stats["reused"] += 1
+            return client
+        if not _configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _configured = True
+        client = GeminiLLM(model_name=model_name, configure=False)
+        _clients[model_name] = client
+        _stats["created"] += 1
+        return client
+
+
+def warm_up(model_names=None):
+    """Create clients at boot so the first request doesn't pay setup cost."""
+    for name in model_names or [DEFAULT_MODEL]:
+        try:
+            get_llm(name)
+        except Exception as e:
+            print(f"Gemini warm-up failed for {name}: {e}")
+
+
+def get_pool_stats() -> dict:
+    with _lock:
+        return {
+            "pid": _pid,
+            "models": sorted(_clients.keys()),
+            **_stats
+        }
+
+
+def _after_fork_in_child():
+    # A lock held by another thread at fork time would never be released here.
+    global _lock
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,63 @@
+import os
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "8"))
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_host_limits = {}
+
+
+def get_session() -> requests.Session:
+    """Keep-alive session shared by all threads of this worker process."""
+    global _session, _session_pid
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=None,  # Serper search is a POST but safe to repeat
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=HTTP_PER_HOST_CONCURRENCY,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+            _host_limits.clear()
+        return _session
+
+
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _lock:
+        limit = _host_limits.get(host)
+        if limit is None:
+            limit = threading.BoundedSemaphore(HTTP_PER_HOST_CONCURRENCY)
+            _host_limits[host] = limit
+        return limit
+
+
+def post(url: str, timeout: float = None, **kwargs) -> requests.Response:
+    """POST through the shared session, capping in-flight requests per host."""
+    session = get_session()
+    with _host_limit(url):
+        return session.post(url, timeout=timeout or HTTP_TIMEOUT, **kwargs)
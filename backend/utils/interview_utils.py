@@ -1,13 +1,17 @@
 
-from utils.gemini import GeminiLLM
+from utils.model_router import get_llm_for
+from utils import llm_dispatcher, llm_metrics
 from dotenv import load_dotenv
-import os
 
 load_dotenv()
 
+FEEDBACK_CACHE_TTL = 3600
+DEGRADED_QUESTION = "Could you tell me more about the last project you worked on and your role in it?"
+
+@llm_metrics.tagged("generate_next_question")
 def generate_next_question(instructions, history, goal):
     messages = []
-    llm = GeminiLLM(api_key=os.getenv("GEMINI_API_KEY"))
+    llm = get_llm_for("interview_turn")
 
     system_prompt = f"""
 You are a professional AI interviewer.
@@ -35,11 +39,13 @@ Goal of the mentee giving the interviw is to learn: {goal}.
         return "Thank you for taking this interview. You will receive feedback from your mentor soon."
     messages.append({"role": "user", "content": "What would be your next question?"})
 
-    response = llm.invoke(messages)
+    # If Gemini is failing, keep the interview going with a generic follow-up
+    response = llm.invoke(messages, priority=llm_dispatcher.INTERACTIVE, degraded=DEGRADED_QUESTION)
     return response.content
 
+@llm_metrics.tagged("fetch_feedback")
 def fetch_feedback(history):
-    llm = GeminiLLM(api_key=os.getenv("GEMINI_API_KEY"))
+    llm = get_llm_for("feedback")
     messages = []
     system_prompt = f"""
     You are a professional AI interviewer. Given the history of questions you have asked 
@@ -51,5 +57,5 @@ def fetch_feedback(history):
 
     messages.append({"role": "user", "content": history})
 
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, cache_ttl=FEEDBACK_CACHE_TTL, priority=llm_dispatcher.BACKGROUND)
     return response.content
\ No newline at end of file
@@ -0,0 +1,304 @@
+import json
+import re
+
+_CLOSERS = {"[": "]", "{": "}"}
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_OPENERS = re.compile(r"[\[{]")
+_NON_SPACE = re.compile(r"\S")
+_STRING_SPECIAL = {
+    '"': re.compile(r'["\\\n\t\r]'),
+    "'": re.compile(r"['\"\\\n\t\r]"),
+}
+
+
+class JSONExtractor:
+    """Incrementally pull the first JSON value out of LLM text.
+
+    Chunks are fed as they arrive; everything before the first bracket
+    (prose, ``` fences) is skipped and everything after the value closes is
+    ignored. While scanning, the text is rewritten into strict JSON: single
+    quoted strings, Python literals, raw newlines in strings and trailing
+    commas are fixed in the same pass. finish() closes a truncated tail.
+    """
+
+    def __init__(self, expect: str = None):
+        self.expect = expect  # "[" or "{" to skip values of the other kind
+        self.out = []
+        self.stack = []       # [opening char, index of last top-level comma, index of opener]
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.quote = '"'
+        self.escape = False
+        self.word = []
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk; returns True once a complete value has been read."""
+        i = 0
+        n = len(chunk)
+        while i < n and not self.done:
+            if self.in_string and not self.escape:
+                # Copy plain string content in one slice instead of per character
+                special = _STRING_SPECIAL[self.quote].search(chunk, i)
+                end = special.start() if special else n
+                if end > i:
+                    self.out.append(chunk[i:end])
+                    i = end
+                    continue
+            elif not self.started:
+                start = _OPENERS.search(chunk, i)
+                if not start:
+                    break
+                i = start.start()
+            elif not self.in_string and chunk[i].isspace():
+                self._flush_word()
+                nonspace = _NON_SPACE.search(chunk, i)
+                i = nonspace.start() if nonspace else n
+                if self.out[-1] != " ":
+                    self.out.append(" ")
+                continue
+            self._step(chunk[i])
+            i += 1
+        return self.done
+
+    def _step(self, c):
+        out = self.out
+        if not self.started:
+            if c in _CLOSERS and (self.expect is None or c == self.expect):
+                self.started = True
+                self.stack.append([c, None, len(out)])
+                out.append(c)
+            return
+
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+                if c == "'":
+                    out[-1] = "'"  # \' is not a JSON escape
+                else:
+                    out.append(c)
+            elif c == "\\":
+                self.escape = True
+                out.append(c)
+            elif c == self.quote:
+                self.in_string = False
+                out.append('"')
+            elif c == '"':
+                out.append('\\"')
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\t":
+                out.append("\\t")
+            elif c != "\r":
+                out.append(c)
+            return
+
+        if c.isalpha() or c == "_":
+            self.word.append(c)
+            return
+        self._flush_word()
+
+        if c in "\"'":
+            self.in_string = True
+            self.quote = c
+            out.append('"')
+        elif c in _CLOSERS:
+            self.stack.append([c, None, len(out)])
+            out.append(c)
+        elif c in "]}":
+            self._drop_trailing_comma()
+            opener = self.stack.pop()[0]
+            out.append(_CLOSERS[opener])
+            if not self.stack:
+                self.done = True
+        elif c == ",":
+            self.stack[-1][1] = len(out)
+            out.append(c)
+        elif not c.isspace() or out[-1] not in " \n":
+            out.append(" " if c.isspace() else c)
+
+    def _flush_word(self):
+        if not self.word:
+            return
+        word = "".join(self.word)
+        self.word = []
+        if word in _LITERALS:
+            word = _LITERALS[word]
+        elif word not in ("true", "false", "null") and not self.out[-1][-1:].isdigit():
+            word = f'"{word}"'  # bare object key; a letter after a digit is an exponent
+        self.out.append(word)
+
+    def _drop_trailing_comma(self):
+        out = self.out
+        while out and out[-1] == " ":
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+
+    def finish(self):
+        """Return the parsed value, repairing a truncated tail if needed."""
+        if not self.started:
+            raise ValueError("No JSON value found in LLM output")
+        self._flush_word()
+        if self.done:
+            return json.loads("".join(self.out))
+
+        out = list(self.out)
+        if self.in_string:
+            if self.escape:
+                out.pop()
+            out.append('"')
+        stack = list(self.stack)
+
+        # Close as-is, else drop the innermost partial element, else drop the
+        # innermost container entirely and retry one level up.
+        while stack:
+            parsed = self._try_close(out, stack)
+            if parsed is not _FAILED:
+                return parsed
+            _, last_comma, open_index = stack[-1]
+            if last_comma is not None:
+                parsed = self._try_close(out[:last_comma], stack)
+                if parsed is not _FAILED:
+                    return parsed
+            out = out[:open_index]
+            stack = stack[:-1]
+        raise ValueError("Could not repair truncated JSON in LLM output")
+
+    @staticmethod
+    def _try_close(out, stack):
+        text = "".join(out).rstrip()
+        while text.endswith(",") or text.endswith(":"):
+            if text.endswith(":"):
+                # Dangling key with no value: drop the key too
+                text = text[:-1].rstrip()
+                if text.endswith('"'):
+                    start = text.rfind('"', 0, len(text) - 1)
+                    text = text[:start].rstrip()
+            else:
+                text = text[:-1].rstrip()
+        text += "".join(_CLOSERS[frame[0]] for frame in reversed(stack))
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return _FAILED
+
+
+_FAILED = object()
+
+
+def extract_json(source, expect: str = None):
+    """Parse the first JSON value from a string or an iterable of streamed chunks.
+
+    Stops reading a stream as soon as the value is complete.
+    """
+    extractor = JSONExtractor(expect)
+    if isinstance(source, str):
+        extractor.feed(source)
+    else:
+        for chunk in source:
+            if extractor.feed(chunk):
+                break
+    return extractor.finish()
+
+
+def validate_outline(data) -> list:
+    """Keep well-formed modules: title, objective and a list of subtopic strings."""
+    if isinstance(data, dict):
+        data = data.get("modules", [])
+    if not isinstance(data, list):
+        raise ValueError("Roadmap outline must be a list of modules")
+    modules = []
+    for mod in data:
+        if not isinstance(mod, dict) or not mod.get("title"):
+            continue
+        subtopics = [str(s).strip() for s in mod.get("subtopics") or [] if str(s).strip()]
+        if not subtopics:
+            continue
+        modules.append({
+            "title": str(mod["title"]).strip(),
+            "objective": str(mod.get("objective") or "").strip(),
+            "subtopics": subtopics
+        })
+    if not modules:
+        raise ValueError("Roadmap outline contains no valid modules")
+    return modules
+
+
+def _list(value) -> list:
+    return value if isinstance(value, list) else []
+
+
+def _strings(value) -> list:
+    """The non-empty strings in a list; a bare string or other value gives []."""
+    return [s.strip() for s in _list(value) if isinstance(s, str) and s.strip()]
+
+
+def _text(value):
+    return (value.strip() or None) if isinstance(value, str) else None
+
+
+def validate_patch(data, outline) -> dict:
+    """Keep the well-formed parts of a roadmap edit patch, checked against the outline it edits.
+
+    Returns {"modify": [...], "remove": [indices], "add": [modules]} with
+    string titles and subtopics only; module indexes must exist in outline.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Roadmap patch must be an object")
+    module_count = len(outline)
+
+    def valid_index(i):
+        return isinstance(i, int) and not isinstance(i, bool) and 0 <= i < module_count
+
+    removed = sorted({i for i in _list(data.get("remove_modules")) if valid_index(i)})
+
+    modify = []
+    for change in _list(data.get("modify_modules")):
+        if not isinstance(change, dict):
+            continue
+        i = change.get("index")
+        if not valid_index(i) or i in removed:
+            continue
+        existing = set(outline[i]["subtopics"])
+        modify.append({
+            "index": i,
+            "title": _text(change.get("title")),
+            "objective": _text(change.get("objective")),
+            "add_subtopics": [s for s in _strings(change.get("add_subtopics")) if s not in existing],
+            "remove_subtopics": [s for s in _strings(change.get("remove_subtopics")) if s in existing]
+        })
+
+    add = []
+    for mod in _list(data.get("add_modules")):
+        if not isinstance(mod, dict) or not _text(mod.get("title")) or not _strings(mod.get("subtopics")):
+            continue
+        add.append({
+            "title": _text(mod["title"]),
+            "objective": _text(mod.get("objective")) or "",
+            "subtopics": _strings(mod.get("subtopics"))
+        })
+
+    return {"modify": modify, "remove": removed, "add": add}
+
+
+def validate_evaluation(data) -> dict:
+    """Keep MCQs with a question, four options and a correct option letter."""
+    if not isinstance(data, dict):
+        raise ValueError("Evaluation must be an object of questions")
+    questions = {}
+    for q in data.values():
+        if not isinstance(q, dict) or not q.get("question"):
+            continue
+        options = {f"option {letter}": q.get(f"option {letter}") for letter in "ABCD"}
+        correct = str(q.get("correct option") or "").strip().upper().replace("OPTION", "").strip()[:1]
+        if not all(options.values()) or correct not in "ABCD" or not correct:
+            continue
+        questions[f"question{len(questions) + 1}"] = {
+            "question": q["question"],
+            **options,
+            "correct option": correct
+        }
+    if not questions:
+        raise ValueError("Evaluation contains no valid questions")
+    return questions
@@ -1,7 +1,36 @@
+import hashlib
 import jwt
 import os
+import time
 from datetime import datetime, timedelta
+from dotenv import load_dotenv
 from utils.custom_error import CustomError
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+# Signing keys are read once per process. Tokens carry the id of the key that
+# signed them ("kid"); to rotate, give the new secret a new JWT_KEY_ID and list
+# the old one in JWT_PREVIOUS_KEYS ("kid:secret,kid:secret") until the tokens
+# it signed have expired.
+JWT_KEY_ID = os.environ.get('JWT_KEY_ID', 'default')
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', '4096'))
+
+
+def _load_keys():
+    keys = {}
+    for entry in os.environ.get('JWT_PREVIOUS_KEYS', '').split(','):
+        kid, _, secret = entry.strip().partition(':')
+        if kid and secret:
+            keys[kid] = secret
+    keys[JWT_KEY_ID] = os.environ.get('JWT_SECRET_KEY', 'your-secret-key')
+    return keys
+
+
+_keys = _load_keys()
+# Verified payloads keyed by a digest of the token, each kept until its exp
+_verified = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=0)
+
 
 class JWTUtils:
     @staticmethod
@@ -18,23 +47,42 @@ class JWTUtils:
 
         token = jwt.encode(
             payload,
-            os.environ.get('JWT_SECRET_KEY', 'your-secret-key'),
-            algorithm='HS256'
+            _keys[JWT_KEY_ID],
+            algorithm='HS256',
+            headers={'kid': JWT_KEY_ID}
         )
 
         return token
 
     @staticmethod
     def verify_token(token):
-        """Verify JWT token"""
+        """Verify JWT token; a token already verified by this worker is not re-checked until it expires"""
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        payload = _verified.get(digest)
+        if payload is not None:
+            return dict(payload)
+
         try:
+            # Tokens issued before key ids were introduced have no kid
+            kid = jwt.get_unverified_header(token).get('kid', JWT_KEY_ID)
+            secret = _keys.get(kid) if isinstance(kid, str) else None
+            if secret is None:
+                raise CustomError("Invalid token", 401)
             payload = jwt.decode(
                 token,
-                os.environ.get('JWT_SECRET_KEY', 'your-secret-key'),
+                secret,
                 algorithms=['HS256']
             )
-            return payload
         except jwt.ExpiredSignatureError:
             raise CustomError("Token has expired", 401)
         except jwt.InvalidTokenError:
             raise CustomError("Invalid token", 401)
+
+        remaining = payload.get('exp', 0) - time.time()
+        if remaining > 0:
+            _verified.set(digest, payload, ttl=remaining)
+        return dict(payload)
+
+
+def get_stats():
+    return _verified.stats()
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from database.db import llm_cache
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "True") == "True"
+
+_memory = TTLCache(maxsize=LLM_CACHE_SIZE)
+_stats = {"mongo_hits": 0, "mongo_misses": 0, "mongo_errors": 0}
+
+
+def make_key(model_name: str, messages) -> str:
+    """Content address for a prompt: model plus whitespace-normalized messages."""
+    normalized = [
+        [m.get("role", "user"), re.sub(r"\s+", " ", m["content"]).strip()]
+        for m in messages
+    ]
+    payload = json.dumps([model_name, normalized], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(key: str):
+    cached = _memory.get(key)
+    if cached is not None or not LLM_CACHE_PERSIST:
+        return cached
+
+    try:
+        doc = llm_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+    except Exception as e:
+        _stats["mongo_errors"] += 1
+        print(f"LLM cache lookup failed: {e}")
+        return None
+
+    if not doc:
+        _stats["mongo_misses"] += 1
+        return None
+    _stats["mongo_hits"] += 1
+    remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+    _memory.set(key, doc["response"], ttl=remaining)
+    return doc["response"]
+
+
+def put(key: str, response: str, ttl: float, model_name: str = None):
+    _memory.set(key, response, ttl=ttl)
+    if not LLM_CACHE_PERSIST:
+        return
+    now = datetime.utcnow()
+    try:
+        llm_cache.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "model": model_name,
+                "response": response,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl)
+            },
+            upsert=True
+        )
+    except Exception as e:
+        _stats["mongo_errors"] += 1
+        print(f"LLM cache write failed: {e}")
+
+
+def evict(key: str):
+    """Drop an entry, e.g. when a cached response turned out to be unparseable."""
+    _memory.pop(key)
+    if not LLM_CACHE_PERSIST:
+        return
+    try:
+        llm_cache.delete_one({"_id": key})
+    except Exception as e:
+        _stats["mongo_errors"] += 1
+        print(f"LLM cache evict failed: {e}")
+
+
+def get_stats() -> dict:
+    return {"memory": _memory.stats(), "persistent_enabled": LLM_CACHE_PERSIST, **_stats}
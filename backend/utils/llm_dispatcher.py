@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from utils.custom_error import CustomError
+
+load_dotenv()
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)  # highest first
+
+# This worker's share of the Gemini quota
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))
+LLM_TPM = float(os.getenv("LLM_TPM", "250000"))
+LLM_BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", "5"))
+QUEUE_LIMITS = {
+    INTERACTIVE: int(os.getenv("LLM_INTERACTIVE_QUEUE", "32")),
+    BACKGROUND: int(os.getenv("LLM_BACKGROUND_QUEUE", "128")),
+}
+DEADLINES = {
+    INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_DEADLINE", "10")),
+    BACKGROUND: float(os.getenv("LLM_BACKGROUND_DEADLINE", "300")),
+}
+
+
+class LLMOverloaded(CustomError):
+    def __init__(self, priority):
+        super().__init__(f"Too many pending {priority} AI requests, please retry shortly", 429)
+
+
+class LLMDeadlineExceeded(CustomError):
+    def __init__(self, priority, waited):
+        super().__init__(f"AI request ({priority}) could not be scheduled within {waited:.1f}s", 503)
+
+
+class TokenBucket:
+    """Refills at rate units/second up to capacity. Not thread-safe; callers lock."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now) -> float:
+        """Seconds until amount is available (0 if it is now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class Dispatcher:
+    """Admits LLM calls in priority order under request and token rate limits.
+
+    Waiters queue per priority class; the head of the highest non-empty class
+    is served first. A full queue rejects immediately and a waiter whose
+    deadline passes is dropped.
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, burst_seconds=LLM_BURST_SECONDS):
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(rpm / 60, max(1.0, rpm / 60 * burst_seconds))
+        self._tokens = TokenBucket(tpm / 60, max(1.0, tpm / 60 * burst_seconds))
+        self._queues = {p: deque() for p in PRIORITIES}
+        self._stats = {
+            p: {"admitted": 0, "rejected": 0, "expired": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for p in PRIORITIES
+        }
+
+    def _is_next(self, priority, ticket) -> bool:
+        for p in PRIORITIES:
+            if p == priority:
+                return self._queues[p][0] is ticket
+            if self._queues[p]:
+                return False
+        return False
+
+    def acquire(self, priority=BACKGROUND, tokens=0, deadline=None) -> float:
+        """Block until this call may proceed; returns seconds spent waiting."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown LLM priority '{priority}'")
+        start = time.monotonic()
+        deadline = start + (DEADLINES[priority] if deadline is None else deadline)
+        ticket = object()
+        stats = self._stats[priority]
+
+        with self._cond:
+            if len(self._queues[priority]) >= QUEUE_LIMITS[priority]:
+                stats["rejected"] += 1
+                raise LLMOverloaded(priority)
+            self._queues[priority].append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._is_next(priority, ticket):
+                        wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+                        if wait == 0:
+                            self._requests.take(1)
+                            self._tokens.take(tokens)
+                            waited = now - start
+                            stats["admitted"] += 1
+                            stats["wait_total"] += waited
+                            stats["wait_max"] = max(stats["wait_max"], waited)
+                            return waited
+                    else:
+                        wait = 0.05
+                    if now >= deadline:
+                        stats["expired"] += 1
+                        raise LLMDeadlineExceeded(priority, now - start)
+                    self._cond.wait(min(wait, deadline - now))
+            finally:
+                self._queues[priority].remove(ticket)
+                self._cond.notify_all()
+
+    def try_acquire(self, priority=BACKGROUND, tokens=0) -> bool:
+        """Admit a call only if no one at this priority or above is waiting
+        and the quota is available right now (used for hedged duplicates)."""
+        with self._cond:
+            for p in PRIORITIES:
+                if self._queues[p]:
+                    return False
+                if p == priority:
+                    break
+            now = time.monotonic()
+            if self._requests.wait_time(1, now) or self._tokens.wait_time(tokens, now):
+                return False
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self._stats[priority]["admitted"] += 1
+            return True
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                p: {
+                    "queue_depth": len(self._queues[p]),
+                    "queue_limit": QUEUE_LIMITS[p],
+                    "avg_wait": round(s["wait_total"] / s["admitted"], 4) if s["admitted"] else 0.0,
+                    **s
+                }
+                for p, s in self._stats.items()
+            }
+
+
+dispatcher = Dispatcher()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (about four characters per token)."""
+    return len(text) // 4 + 1
@@ -0,0 +1,216 @@
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from flask import has_request_context, request
+from database.db import llm_calls
+from utils.llm_dispatcher import estimate_tokens
+
+load_dotenv()
+
+# Fraction of LLM calls written to the llm_calls collection for offline analysis
+LLM_CALL_SAMPLE_RATE = float(os.getenv("LLM_CALL_SAMPLE_RATE", "0.05"))
+LLM_CALL_SAMPLE_DAYS = int(os.getenv("LLM_CALL_SAMPLE_DAYS", "14"))
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+CHAR_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+
+class CallTag:
+    """Who is calling the LLM. Shared by reference with copied contexts so a
+    parse result reported by the caller reaches the sample recorded in a
+    worker thread."""
+
+    def __init__(self, caller=None, endpoint=None):
+        self.caller = caller
+        self.endpoint = endpoint
+        self.last_sample = None
+
+
+_tag = contextvars.ContextVar("llm_call_tag", default=None)
+
+
+@contextmanager
+def tagged(caller: str = None, endpoint: str = None):
+    """Attribute LLM calls in this block to caller; nested tags are joined
+    with dots (create_roadmap -> create_roadmap.mcq)."""
+    outer = _tag.get()
+    if outer and outer.caller and caller:
+        caller = f"{outer.caller}.{caller}"
+    token = _tag.set(CallTag(
+        caller or (outer.caller if outer else None),
+        endpoint or (outer.endpoint if outer else None) or _request_endpoint()
+    ))
+    try:
+        yield
+    finally:
+        _tag.reset(token)
+
+
+def bind(fn):
+    """Carry the current tag (or at least the Flask endpoint) into a
+    function run on another thread."""
+    context = contextvars.copy_context()
+    if context.get(_tag) is None:
+        context.run(_tag.set, CallTag(endpoint=_request_endpoint()))
+    return functools.partial(context.run, fn)
+
+
+def _request_endpoint():
+    return request.endpoint if has_request_context() else None
+
+
+def current_tag() -> CallTag:
+    return _tag.get() or CallTag(endpoint=_request_endpoint())
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        labels = [str(b) for b in self.bounds] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "mean": round(self.total / self.count, 4) if self.count else 0.0
+        }
+
+
+class _Series:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.parse_ok = 0
+        self.parse_failed = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.response_chars = Histogram(CHAR_BUCKETS)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "parse_ok": self.parse_ok,
+            "parse_failed": self.parse_failed,
+            "latency_seconds": self.latency.snapshot(),
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "response_chars": self.response_chars.snapshot()
+        }
+
+
+_lock = threading.Lock()
+_by_caller = {}
+_by_endpoint = {}
+_stats = {"sampled": 0, "sample_errors": 0}
+
+
+def record(model_name, started, prompt, response=None, error=None, cached=False, queue_wait=0.0,
+           coalesced=False):
+    """Record one finished LLM call under the current tag.
+
+    cached and coalesced calls (served by another caller's identical request
+    in flight) made no upstream request of their own.
+    """
+    tag = current_tag()
+    latency = time.monotonic() - started
+    sample = {
+        "model": model_name,
+        "caller": tag.caller or "untagged",
+        "endpoint": tag.endpoint or "none",
+        "started_at": datetime.utcnow() - timedelta(seconds=latency),
+        "latency": round(latency, 4),
+        "queue_wait": round(queue_wait, 4),
+        "prompt_chars": len(prompt),
+        "prompt_tokens": estimate_tokens(prompt),
+        "response_chars": len(response) if response is not None else 0,
+        "cached": cached,
+        "coalesced": coalesced,
+        "error": type(error).__name__ if error else None,
+        "parse_ok": None
+    }
+    with _lock:
+        for series in (_series(_by_caller, sample["caller"]), _series(_by_endpoint, sample["endpoint"])):
+            series.calls += 1
+            series.errors += error is not None
+            series.cache_hits += cached
+            series.coalesced += coalesced
+            series.latency.observe(latency)
+            series.prompt_tokens.observe(sample["prompt_tokens"])
+            series.response_chars.observe(sample["response_chars"])
+    tag.last_sample = sample
+
+    if LLM_CALL_SAMPLE_RATE > 0 and random.random() < LLM_CALL_SAMPLE_RATE:
+        try:
+            doc = dict(sample, created_at=datetime.utcnow(),
+                       expires_at=datetime.utcnow() + timedelta(days=LLM_CALL_SAMPLE_DAYS))
+            sample["_id"] = llm_calls.insert_one(doc).inserted_id
+            _stats["sampled"] += 1
+        except Exception as e:
+            _stats["sample_errors"] += 1
+            print(f"LLM call sample write failed: {e}")
+
+
+def mark_parse(ok: bool):
+    """Report whether the caller could parse the last LLM response in this context."""
+    tag = _tag.get()
+    sample = tag.last_sample if tag else None
+    if sample is None or sample["parse_ok"] is not None or sample["error"]:
+        return
+    sample["parse_ok"] = ok
+    field = "parse_ok" if ok else "parse_failed"
+    with _lock:
+        for series in (_series(_by_caller, sample["caller"]), _series(_by_endpoint, sample["endpoint"])):
+            setattr(series, field, getattr(series, field) + 1)
+    if "_id" in sample:
+        try:
+            llm_calls.update_one({"_id": sample["_id"]}, {"$set": {"parse_ok": ok}})
+        except Exception as e:
+            print(f"LLM call sample update failed: {e}")
+
+
+@contextmanager
+def parsing():
+    """mark_parse() the outcome of the parse done in this block."""
+    try:
+        yield
+    except Exception:
+        mark_parse(False)
+        raise
+    mark_parse(True)
+
+
+def _series(table, name) -> _Series:
+    if name not in table:
+        table[name] = _Series()
+    return table[name]
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {
+            "by_caller": {name: s.snapshot() for name, s in _by_caller.items()},
+            "by_endpoint": {name: s.snapshot() for name, s in _by_endpoint.items()},
+            "sample_rate": LLM_CALL_SAMPLE_RATE,
+            **_stats
+        }
@@ -0,0 +1,271 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from utils.custom_error import CustomError
+
+load_dotenv()
+
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "60"))
+# Streams: time to the first chunk, and for the whole response
+LLM_STREAM_FIRST_CHUNK_DEADLINE = float(os.getenv("LLM_STREAM_FIRST_CHUNK_DEADLINE", "30"))
+LLM_STREAM_DEADLINE = float(os.getenv("LLM_STREAM_DEADLINE", "180"))
+# Send a duplicate request once a call is slower than this percentile of
+# recent calls to the same model; 0 disables hedging.
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "10"))  # until enough samples exist
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = 200
+
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMTimeout(CustomError):
+    def __init__(self, model_name, deadline):
+        super().__init__(f"AI model {model_name} did not respond within {deadline:g}s", 504)
+
+
+class LLMUnavailable(CustomError):
+    def __init__(self, model_name):
+        super().__init__(f"AI model {model_name} is temporarily unavailable, please retry shortly", 503)
+
+
+class CircuitBreaker:
+    """Opens when the error rate over the last `window` calls crosses the
+    threshold; after the cooldown a single probe call decides whether to
+    close again."""
+
+    def __init__(self, window=LLM_BREAKER_WINDOW, min_calls=LLM_BREAKER_MIN_CALLS,
+                 error_rate=LLM_BREAKER_ERROR_RATE, cooldown=LLM_BREAKER_COOLDOWN):
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        self.stats = {"successes": 0, "failures": 0, "short_circuits": 0, "opens": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.stats["short_circuits"] += 1
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            self.stats["successes" if ok else "failures"] += 1
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+            elif self.state == CLOSED:
+                self._outcomes.append(ok)
+                failures = self._outcomes.count(False)
+                if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.stats["opens"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            failures = self._outcomes.count(False)
+            return {
+                "state": self.state,
+                "recent_error_rate": round(failures / len(self._outcomes), 4) if self._outcomes else 0.0,
+                **self.stats
+            }
+
+
+class ModelHealth:
+    """Deadlines, hedging and circuit breaking for calls to one model."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.breaker = CircuitBreaker()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0}
+
+    def hedge_delay(self):
+        if LLM_HEDGE_PERCENTILE <= 0:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DELAY
+        return samples[min(len(samples) - 1, int(len(samples) * LLM_HEDGE_PERCENTILE / 100))]
+
+    def call(self, fn, deadline=None, can_hedge=lambda: True):
+        """Run fn() under a deadline, hedging once if it is slow or fails.
+
+        Raises LLMUnavailable without calling fn while the breaker is open.
+        """
+        if not self.breaker.allow():
+            raise LLMUnavailable(self.model_name)
+        deadline = LLM_CALL_DEADLINE if deadline is None else deadline
+        started = time.monotonic()
+        try:
+            result, attempt = self._hedged(fn, deadline, lambda: self.breaker.state == CLOSED and can_hedge())
+        except Exception as e:
+            self.breaker.record(False)
+            with self._lock:
+                self.stats["calls"] += 1
+                self.stats["timeouts"] += isinstance(e, LLMTimeout)
+            raise
+        self.breaker.record(True)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["hedge_wins"] += attempt == 1
+            self._latencies.append(time.monotonic() - started)
+        return result
+
+    def _hedged(self, fn, deadline, can_hedge):
+        """Returns (result, attempt index) of the first attempt to succeed.
+
+        A second attempt starts once the hedge delay passes, or as soon as
+        the first one fails, if can_hedge() allows it. Losing attempts are
+        left to finish in the background.
+        """
+        pool = _pool()
+        start = time.monotonic()
+        end = start + deadline
+        hedge_after = self.hedge_delay()
+        hedge_tried = hedge_after is None
+        pending = {pool.submit(fn): 0}
+        error = None
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                raise LLMTimeout(self.model_name, deadline)
+            timeout = end - now
+            if not hedge_tried:
+                timeout = min(timeout, max(0.0, start + hedge_after - now))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = pending.pop(future)
+                if future.exception() is None:
+                    return future.result(), attempt
+                error = error or future.exception()
+            if not hedge_tried and (done or time.monotonic() >= start + hedge_after):
+                hedge_tried = True
+                if can_hedge():
+                    with self._lock:
+                        self.stats["hedged"] += 1
+                    pending[pool.submit(fn)] = 1
+            if not pending:
+                raise error
+
+    def stream(self, open_stream, first_chunk_deadline=None, deadline=None):
+        """Yield the chunks of open_stream() under a first-chunk and a total deadline.
+
+        Chunks are pulled on the call pool so a stalled upstream raises
+        LLMTimeout here instead of blocking the caller; the stalled pull is
+        left to finish in the background. Outcomes feed the breaker.
+        """
+        first_chunk_deadline = LLM_STREAM_FIRST_CHUNK_DEADLINE if first_chunk_deadline is None else first_chunk_deadline
+        deadline = LLM_STREAM_DEADLINE if deadline is None else deadline
+        started = time.monotonic()
+        chunks = []  # the upstream iterator, opened by the first pull
+
+        def pull():
+            if not chunks:
+                chunks.append(iter(open_stream()))
+            return next(chunks[0], _END)
+
+        with self.observe():
+            first = True
+            while True:
+                limit, budget = started + deadline, deadline
+                if first and first_chunk_deadline < deadline:
+                    limit, budget = started + first_chunk_deadline, first_chunk_deadline
+                try:
+                    chunk = _pool().submit(pull).result(timeout=max(0.0, limit - time.monotonic()))
+                except FutureTimeout:
+                    with self._lock:
+                        self.stats["timeouts"] += 1
+                    raise LLMTimeout(self.model_name, budget)
+                if chunk is _END:
+                    return
+                first = False
+                yield chunk
+
+    @contextmanager
+    def observe(self):
+        """Feed the breaker from a streamed call; a consumer closing the stream early is not a failure."""
+        try:
+            yield
+        except GeneratorExit:
+            self.breaker.record(True)
+            raise
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        delay = self.hedge_delay()
+        return {
+            "breaker": self.breaker.snapshot(),
+            "hedge_delay": round(delay, 4) if delay is not None else None,
+            **stats
+        }
+
+
+_END = object()
+_executor = None
+_executor_pid = None
+_registry_lock = threading.Lock()
+_health = {}
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _registry_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("LLM_CALL_THREADS", "32")),
+                    thread_name_prefix="llm-call"
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def health_for(model_name: str) -> ModelHealth:
+    with _registry_lock:
+        if model_name not in _health:
+            _health[model_name] = ModelHealth(model_name)
+        return _health[model_name]
+
+
+def get_stats() -> dict:
+    with _registry_lock:
+        models = dict(_health)
+    return {name: health.snapshot() for name, health in models.items()}
@@ -0,0 +1,200 @@
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from dotenv import load_dotenv
+from models.user import UserModel
+from utils.skill_taxonomy import skill_ids
+
+load_dotenv()
+
+# Mentors sent to the LLM per match, and how often a worker rebuilds its index
+# from Mongo to pick up profile changes made through other workers.
+MATCH_SHORTLIST_SIZE = int(os.getenv("MATCH_SHORTLIST_SIZE", "15"))
+MENTOR_INDEX_REFRESH_SECONDS = int(os.getenv("MENTOR_INDEX_REFRESH_SECONDS", "300"))
+
+PHRASE_WEIGHT = 2.0     # a whole skill/goal string matches
+TOKEN_WEIGHT = 1.0      # a word inside one matches
+LANGUAGE_WEIGHT = 0.5
+EXPERIENCE_WEIGHT = {"beginner": 0.25, "intermediate": 0.5, "advanced": 1.0}
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_YEARS = re.compile(r"(\d+(?:\.\d+)?)\s*\+?\s*(?:years?|yrs?)")
+_STOPWORDS = {"and", "or", "the", "of", "in", "for", "to", "with", "a", "an", "on", "basics", "learn"}
+
+
+def normalize_phrase(text) -> str:
+    return " ".join(tokenize(text))
+
+
+def tokenize(text) -> list:
+    return [t.rstrip(".") for t in _TOKEN.findall(str(text).lower()) if t.rstrip(".") not in _STOPWORDS]
+
+
+def _years(experience) -> float:
+    match = _YEARS.search(str(experience).lower())
+    return float(match.group(1)) if match else 0.0
+
+
+def mentor_terms(profile: dict) -> dict:
+    """Index terms for a mentor profile and their weights."""
+    terms = {}
+    for skill in profile.get("skills") or []:
+        phrase = normalize_phrase(skill)
+        if phrase:
+            terms[f"skill:{phrase}"] = PHRASE_WEIGHT
+        for token in tokenize(skill):
+            terms.setdefault(f"word:{token}", TOKEN_WEIGHT)
+    # Canonical IDs let "ML" meet "machine learning"
+    for skill_id in profile.get("skill_ids") or skill_ids(profile.get("skills")):
+        terms[f"id:{skill_id}"] = PHRASE_WEIGHT
+    for language in profile.get("languages") or []:
+        if normalize_phrase(language):
+            terms[f"lang:{normalize_phrase(language)}"] = LANGUAGE_WEIGHT
+    return terms
+
+
+def query_terms(goals) -> set:
+    terms = set()
+    for goal in goals or []:
+        phrase = normalize_phrase(goal)
+        if phrase:
+            terms.add(f"skill:{phrase}")
+        terms.update(f"word:{token}" for token in tokenize(goal))
+    terms.update(f"id:{skill_id}" for skill_id in skill_ids(goals))
+    return terms
+
+
+def mentor_summary(mentor: dict) -> dict:
+    """The mentor fields the match prompt shows the LLM."""
+    profile = mentor.get("profile", {})
+    return {
+        "id": str(mentor["_id"]),
+        "name": mentor.get("name"),
+        "email": mentor.get("email"),
+        "skills": profile.get("skills", []),
+        "experience": profile.get("experience", ""),
+        "mentoring_style": profile.get("mentoring_style", ""),
+        "languages": profile.get("languages", []),
+        "bio": profile.get("bio", "")
+    }
+
+
+class MentorIndex:
+    """Inverted index from skill, word and language terms to mentors.
+
+    A query only touches the postings of its own terms, so shortlisting cost
+    follows the number of matching mentors rather than the whole pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}   # term -> {mentor_id: weight}
+        self._terms = {}      # mentor_id -> {term: weight}
+        self._mentors = {}    # mentor_id -> mentor_summary()
+        self._years = {}
+        self.built_at = 0.0
+
+    def build(self, mentors):
+        postings, terms, summaries, years = {}, {}, {}, {}
+        for mentor in mentors:
+            mentor_id = str(mentor["_id"])
+            terms[mentor_id] = mentor_terms(mentor.get("profile", {}))
+            summaries[mentor_id] = mentor_summary(mentor)
+            years[mentor_id] = _years(mentor.get("profile", {}).get("experience", ""))
+            for term, weight in terms[mentor_id].items():
+                postings.setdefault(term, {})[mentor_id] = weight
+        with self._lock:
+            self._postings, self._terms, self._mentors, self._years = postings, terms, summaries, years
+            self.built_at = time.monotonic()
+
+    def upsert(self, mentor):
+        """Reindex one mentor after register or a profile update."""
+        mentor_id = str(mentor["_id"])
+        if mentor.get("role") != "mentor":
+            self.remove(mentor_id)
+            return
+        new_terms = mentor_terms(mentor.get("profile", {}))
+        with self._lock:
+            self._unlink(mentor_id)
+            self._terms[mentor_id] = new_terms
+            self._mentors[mentor_id] = mentor_summary(mentor)
+            self._years[mentor_id] = _years(mentor.get("profile", {}).get("experience", ""))
+            for term, weight in new_terms.items():
+                self._postings.setdefault(term, {})[mentor_id] = weight
+
+    def remove(self, mentor_id):
+        with self._lock:
+            self._unlink(str(mentor_id))
+
+    def _unlink(self, mentor_id):
+        for term in self._terms.pop(mentor_id, {}):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(mentor_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._mentors.pop(mentor_id, None)
+        self._years.pop(mentor_id, None)
+
+    def shortlist(self, goals, experience_level="", languages=None, k=MATCH_SHORTLIST_SIZE) -> list:
+        """Top-k mentor summaries for a mentee, best first.
+
+        Terms are weighted by inverse document frequency so a rare skill
+        counts for more than a common one. If fewer than k mentors share a
+        term the list is padded with other mentors so the LLM still has a
+        choice. Shared languages and experience only re-rank mentors that
+        matched a skill; they would otherwise touch nearly every mentor.
+        """
+        experience_weight = EXPERIENCE_WEIGHT.get(str(experience_level).lower(), 0.5)
+        with self._lock:
+            total = len(self._mentors)
+            scores = {}
+            for term in query_terms(goals):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + total / len(posting))
+                for mentor_id, weight in posting.items():
+                    scores[mentor_id] = scores.get(mentor_id, 0.0) + weight * idf
+            language_terms = {f"lang:{normalize_phrase(language)}" for language in languages or [] if normalize_phrase(language)}
+            for mentor_id in scores:
+                scores[mentor_id] += LANGUAGE_WEIGHT * len(language_terms & self._terms[mentor_id].keys())
+                scores[mentor_id] += min(self._years[mentor_id], 10) / 10 * experience_weight
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            chosen = [self._mentors[mentor_id] for mentor_id, _ in best]
+            if len(chosen) < k:
+                for mentor_id, summary in self._mentors.items():
+                    if len(chosen) >= k:
+                        break
+                    if mentor_id not in scores:
+                        chosen.append(summary)
+            return chosen
+
+    def get(self, mentor_id):
+        with self._lock:
+            return self._mentors.get(mentor_id)
+
+    def __len__(self):
+        return len(self._mentors)
+
+
+index = MentorIndex()
+_build_lock = threading.Lock()
+
+
+def get_index() -> MentorIndex:
+    """The worker's mentor index, (re)built from Mongo when missing or stale."""
+    if not index.built_at or time.monotonic() - index.built_at > MENTOR_INDEX_REFRESH_SECONDS:
+        with _build_lock:
+            if not index.built_at or time.monotonic() - index.built_at > MENTOR_INDEX_REFRESH_SECONDS:
+                index.build(UserModel.get_all_mentors())
+    return index
+
+
+def on_user_saved(user):
+    """Keep this worker's index current when a mentor registers or edits their profile."""
+    if user and index.built_at:
+        index.upsert(user)
@@ -0,0 +1,348 @@
+"""TF-IDF similarity index over mentor profiles.
+
+Each mentor's skills, bio and mentoring style become one L2-normalised
+TF-IDF row of a sparse (CSR) matrix, so a mentee's goals are scored against
+every mentor with a single sparse matrix-vector product. The matrix is saved
+under MENTOR_VECTORS_DIR and workers load it with mmap, so startup only maps
+the files instead of re-tokenising every profile.
+
+Rebuild from the command line with:  python -m utils.mentor_vectors
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+from dotenv import load_dotenv
+from models.user import UserModel
+from utils.mentor_index import normalize_phrase, tokenize
+from utils.skill_taxonomy import skill_ids, taxonomy
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialised across processes
+    fcntl = None
+
+load_dotenv()
+
+MENTOR_VECTORS_DIR = os.getenv(
+    "MENTOR_VECTORS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "indexes", "mentor_vectors")
+)
+MENTOR_VECTORS_MAX_AGE = int(os.getenv("MENTOR_VECTORS_MAX_AGE", "3600"))
+MENTOR_VECTOR_VOCAB = int(os.getenv("MENTOR_VECTOR_VOCAB", "20000"))
+KEEP_VERSIONS = 2
+
+FIELD_WEIGHTS = {"skills": 3.0, "mentoring_style": 1.0, "bio": 1.0}
+
+
+def _terms(tokens) -> list:
+    """Unigrams plus adjacent bigrams."""
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def profile_counts(profile: dict) -> Counter:
+    counts = Counter()
+    for skill in profile.get("skills") or []:
+        for term in _terms(tokenize(skill)) + [f"skill:{normalize_phrase(skill)}"]:
+            counts[term] += FIELD_WEIGHTS["skills"]
+    for skill_id in profile.get("skill_ids") or skill_ids(profile.get("skills")):
+        counts[f"id:{skill_id}"] += FIELD_WEIGHTS["skills"]
+    for field in ("mentoring_style", "bio"):
+        for term in _terms(tokenize(profile.get(field) or "")):
+            counts[term] += FIELD_WEIGHTS[field]
+    return counts
+
+
+def goal_counts(goals) -> Counter:
+    counts = Counter()
+    for goal in goals or []:
+        counts.update(_terms(tokenize(goal)) + [f"skill:{normalize_phrase(goal)}"])
+    counts.update(f"id:{skill_id}" for skill_id in skill_ids(goals))
+    return counts
+
+
+class MentorVectors:
+    def __init__(self, mentor_ids, vocab, idf, indptr, indices, data, built_at):
+        self.mentor_ids = mentor_ids
+        self.vocab = vocab
+        self.columns = {term: i for i, term in enumerate(vocab)}
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.built_at = built_at
+        self._row_of = np.repeat(np.arange(len(mentor_ids), dtype=np.int32), np.diff(indptr))
+
+    @classmethod
+    def build(cls, mentors):
+        rows = [(str(m["_id"]), profile_counts(m.get("profile", {}))) for m in mentors]
+        df = Counter()
+        for _, counts in rows:
+            df.update(counts.keys())
+        vocab = [term for term, _ in df.most_common(MENTOR_VECTOR_VOCAB)]
+        columns = {term: i for i, term in enumerate(vocab)}
+        idf = np.log((1 + len(rows)) / (1 + np.array([df[t] for t in vocab], dtype=np.float32))) + 1
+
+        indptr = [0]
+        indices = []
+        data = []
+        for _, counts in rows:
+            cols = np.array([columns[t] for t in counts if t in columns], dtype=np.int32)
+            tf = np.array([counts[t] for t in counts if t in columns], dtype=np.float32)
+            weights = (1 + np.log(tf)) * idf[cols] if len(cols) else tf
+            norm = np.linalg.norm(weights)
+            order = np.argsort(cols)
+            indices.append(cols[order])
+            data.append((weights / norm if norm else weights)[order])
+            indptr.append(indptr[-1] + len(cols))
+        return cls(
+            [mentor_id for mentor_id, _ in rows], vocab, idf.astype(np.float32),
+            np.array(indptr, dtype=np.int64),
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+            np.concatenate(data).astype(np.float32) if data else np.zeros(0, dtype=np.float32),
+            time.time()
+        )
+
+    def query_vector(self, goals):
+        q = np.zeros(len(self.vocab), dtype=np.float32)
+        for term, count in goal_counts(goals).items():
+            col = self.columns.get(term)
+            if col is not None:
+                q[col] = (1 + np.log(count)) * self.idf[col]
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def scores(self, goals):
+        """Cosine similarity of the goals to every mentor, in mentor_ids order."""
+        q = self.query_vector(goals)
+        return np.bincount(self._row_of, weights=self.data * q[self.indices], minlength=len(self.mentor_ids))
+
+    def top(self, goals, k=10) -> list:
+        """[(mentor_id, score)] for the k most similar mentors with a positive score."""
+        scores = self.scores(goals)
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.mentor_ids[i], float(scores[i])) for i in best if scores[i] > 0]
+
+    def top_many(self, goal_lists, k=50, chunk=512):
+        """Top-k mentor rows and scores for many mentees at once.
+
+        Only the vocabulary columns the mentees use are densified, so the
+        mentee x mentor score matrix is one BLAS product per chunk of
+        mentees. Returns (rows, scores), each len(goal_lists) x k, best first.
+        """
+        queries = [self.query_vector(goals) for goals in goal_lists] if goal_lists else []
+        used = np.unique(np.concatenate([np.flatnonzero(q) for q in queries])) if queries else np.zeros(0, dtype=np.int64)
+        n, m = len(queries), len(self.mentor_ids)
+        k = min(k, m)
+        rows = np.zeros((n, k), dtype=np.int64)
+        scores = np.zeros((n, k), dtype=np.float32)
+        if not n or not k or not len(used):
+            return rows, scores
+
+        position = np.full(len(self.vocab), -1, dtype=np.int64)
+        position[used] = np.arange(len(used))
+        mask = position[self.indices] >= 0
+        mentors = np.zeros((m, len(used)), dtype=np.float32)
+        mentors[self._row_of[mask], position[self.indices[mask]]] = self.data[mask]
+        query_matrix = np.stack([q[used] for q in queries])
+
+        for start in range(0, n, chunk):
+            block = query_matrix[start:start + chunk] @ mentors.T
+            best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(block, best, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+            rows[start:start + chunk] = np.take_along_axis(best, order, axis=1)
+            scores[start:start + chunk] = np.take_along_axis(best_scores, order, axis=1)
+        return rows, scores
+
+    def shared_terms(self, mentor_id, goals, limit=3) -> list:
+        """The terms contributing most to a mentor's score, for explanations."""
+        row = self.mentor_ids.index(mentor_id)
+        q = self.query_vector(goals)
+        cols = self.indices[self.indptr[row]:self.indptr[row + 1]]
+        contrib = self.data[self.indptr[row]:self.indptr[row + 1]] * q[cols]
+        terms = []
+        for i in np.argsort(-contrib):
+            term = self.vocab[cols[i]]
+            term = (taxonomy.name(int(term[3:])) or term) if term.startswith("id:") else term.replace("skill:", "")
+            if contrib[i] <= 0 or len(terms) == limit:
+                break
+            if term not in terms:
+                terms.append(term)
+        return terms
+
+    # --- persistence ------------------------------------------------------
+
+    def save(self, directory=MENTOR_VECTORS_DIR):
+        """Write a new version directory and point CURRENT at it, unless a newer build is current.
+
+        The version is written under a hidden staging name and renamed into
+        place, so other workers never load or clean up a half-written one.
+        """
+        version = f"{int(self.built_at * 1000)}-{os.getpid()}"
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=directory)
+        try:
+            for name in ("idf", "indptr", "indices", "data"):
+                np.save(os.path.join(staging, f"{name}.npy"), getattr(self, name))
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"mentor_ids": self.mentor_ids, "vocab": self.vocab, "built_at": self.built_at}, f)
+            os.rename(staging, os.path.join(directory, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        pointer = os.path.join(directory, "CURRENT")
+        with _locked(directory):
+            current = _read_pointer(directory)
+            if current is None or _version_time(current) < _version_time(version):
+                with open(f"{pointer}.{os.getpid()}.tmp", "w") as f:
+                    f.write(version)
+                os.replace(f"{pointer}.{os.getpid()}.tmp", pointer)
+                current = version
+            # Old versions can go: workers still mapping them keep their open files
+            versions = sorted(
+                (d for d in os.listdir(directory)
+                 if not d.startswith(".") and os.path.isdir(os.path.join(directory, d))),
+                key=_version_time
+            )
+            for old in versions[:-KEEP_VERSIONS]:
+                if old != current:
+                    shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory=MENTOR_VECTORS_DIR):
+        """Map the current version; returns None if nothing has been saved yet."""
+        try:
+            with open(os.path.join(directory, "CURRENT")) as f:
+                path = os.path.join(directory, f.read().strip())
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                for name in ("idf", "indptr", "indices", "data")
+            }
+        except (OSError, ValueError) as e:
+            print(f"Mentor vectors not loaded: {e}")
+            return None
+        return cls(meta["mentor_ids"], meta["vocab"], built_at=meta["built_at"], **arrays)
+
+
+def _version_time(version) -> int:
+    """Build time in ms from a "<built_at ms>-<pid>" version name; -1 if unparseable."""
+    try:
+        return int(version.split("-", 1)[0])
+    except ValueError:
+        return -1
+
+
+def _read_pointer(directory):
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+@contextmanager
+def _locked(directory):
+    """Serialise pointer updates and cleanup between processes saving to directory."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# _lock guards the globals below and is never held while loading or building;
+# _build_lock makes concurrent first requests in a worker wait for one build.
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_current = None
+_stale = False
+_rebuilding = False
+
+
+def rebuild() -> MentorVectors:
+    vectors = MentorVectors.build(UserModel.get_all_mentors())
+    try:
+        vectors.save()
+    except OSError as e:
+        print(f"Saving mentor vectors failed: {e}")
+    return vectors
+
+
+def _rebuild_in_background():
+    global _current, _rebuilding
+    try:
+        vectors = rebuild()
+        with _lock:
+            if vectors.built_at > _current.built_at:
+                _current = vectors
+    except Exception as e:
+        print(f"Rebuilding mentor vectors failed: {e}")
+    finally:
+        with _lock:
+            _rebuilding = False
+
+
+def _first_vectors() -> MentorVectors:
+    """Map the saved index, or build one, exactly once per worker."""
+    global _current
+    with _build_lock:
+        with _lock:
+            if _current is not None:
+                return _current
+        vectors = MentorVectors.load() or rebuild()
+        with _lock:
+            if _current is None:
+                _current = vectors
+            return _current
+
+
+def get_vectors() -> MentorVectors:
+    """This worker's index: mapped from disk, built if missing, and rebuilt in
+    the background once stale while the old one keeps serving."""
+    global _current, _stale, _rebuilding
+    vectors = _current or _first_vectors()
+    if time.time() - vectors.built_at > MENTOR_VECTORS_MAX_AGE and not _rebuilding:
+        # Another worker (or the CLI) may already have saved a newer build
+        saved = MentorVectors.load()
+        with _lock:
+            if saved is not None and saved.built_at > _current.built_at:
+                _current = saved
+    with _lock:
+        expired = time.time() - _current.built_at > MENTOR_VECTORS_MAX_AGE
+        if (_stale or expired) and not _rebuilding:
+            _rebuilding = True
+            _stale = False  # changes saved from here on need another rebuild
+            threading.Thread(target=_rebuild_in_background, daemon=True).start()
+        return _current
+
+
+def on_user_saved(user):
+    """A mentor's profile changed; refresh the index on next use."""
+    global _stale
+    if user and user.get("role") == "mentor":
+        with _lock:
+            _stale = True
+
+
+if __name__ == "__main__":
+    started = time.time()
+    vectors = rebuild()
+    print(f"Indexed {len(vectors.mentor_ids)} mentors, {len(vectors.vocab)} terms, "
+          f"{len(vectors.data)} non-zeros in {time.time() - started:.2f}s -> {MENTOR_VECTORS_DIR}")
@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from dotenv import load_dotenv
+from utils.gemini import get_llm
+from utils.llm_resilience import LLMUnavailable
+from utils import llm_metrics
+
+load_dotenv()
+
+FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash-lite")
+
+# task -> model, latency budget (seconds) and the faster model to fall back to
+# once the budget is spent. Without a fallback the budget is the call's
+# deadline (for streams, the first chunk's) and running over it raises
+# LLMTimeout. Override with LLM_ROUTES='{"mcq": {"budget": 10}}'.
+ROUTES = {
+    "roadmap_outline": {"model": "gemini-2.5-flash", "budget": 45, "fallback": FAST_MODEL},
+    "mcq":             {"model": FAST_MODEL, "budget": 20, "fallback": None},
+    "interview_turn":  {"model": FAST_MODEL, "budget": 6, "fallback": None},
+    "feedback":        {"model": "gemini-2.5-flash", "budget": 30, "fallback": FAST_MODEL},
+    "match":           {"model": "gemini-2.5-flash", "budget": 20, "fallback": FAST_MODEL},
+    "edit":            {"model": "gemini-2.5-flash", "budget": 45, "fallback": FAST_MODEL},
+}
+for _task, _override in json.loads(os.getenv("LLM_ROUTES", "{}")).items():
+    ROUTES.setdefault(_task, {"model": FAST_MODEL, "budget": 30, "fallback": None}).update(_override)
+
+LATENCY_SAMPLES = 256
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("LLM_ROUTER_THREADS", "16")),
+                    thread_name_prefix="llm-route"
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _record(task, started, fell_back, failed=False):
+    elapsed = time.monotonic() - started
+    with _stats_lock:
+        s = _stats.setdefault(task, {"calls": 0, "fallbacks": 0, "errors": 0, "latency_max": 0.0, "samples": []})
+        s["calls"] += 1
+        s["fallbacks"] += fell_back
+        s["errors"] += failed
+        s["latency_max"] = max(s["latency_max"], elapsed)
+        s["samples"].append(elapsed)
+        if len(s["samples"]) > LATENCY_SAMPLES:
+            s["samples"].pop(0)
+
+
+def _first_success(futures):
+    """Result of whichever future succeeds first, and which one it was."""
+    error = None
+    for future in as_completed(futures):
+        if future.exception() is None:
+            return future, future.result()
+        error = error or future.exception()
+    raise error
+
+
+def _drain(stream):
+    try:
+        for _ in stream:
+            pass
+    except Exception as e:
+        print(f"Abandoned LLM stream failed: {e}")
+
+
+class RoutedLLM:
+    """GeminiLLM-compatible client that picks the model for a task and
+    falls back to a faster one when the call runs over its latency budget."""
+
+    def __init__(self, task: str):
+        if task not in ROUTES:
+            raise ValueError(f"No model route for task '{task}'")
+        self.task = task
+        self.route = ROUTES[task]
+        self.model_name = self.route["model"]
+
+    def _fallback(self):
+        fallback = self.route.get("fallback")
+        return fallback if fallback and fallback != self.model_name else None
+
+    def invoke(self, messages, **kwargs):
+        started = time.monotonic()
+        fallback = self._fallback()
+        try:
+            if not fallback:
+                # Nothing to race, so call in this thread rather than hold a router pool slot
+                kwargs.setdefault("deadline", self.route["budget"])
+                result = get_llm(self.model_name).invoke(messages, **kwargs)
+                _record(self.task, started, False)
+                return result
+            primary = _pool().submit(llm_metrics.bind(get_llm(self.model_name).invoke), messages, **kwargs)
+            try:
+                result = primary.result(timeout=self.route["budget"])
+                _record(self.task, started, False)
+                return result
+            except FutureTimeout:
+                # Over budget: race the faster model against the still-running primary
+                racers = [primary]
+            except LLMUnavailable:
+                # The primary model's circuit breaker is open
+                racers = []
+            secondary = _pool().submit(llm_metrics.bind(get_llm(fallback).invoke), messages, **kwargs)
+            winner, result = _first_success(racers + [secondary])
+            _record(self.task, started, winner is secondary)
+            return result
+        except Exception:
+            _record(self.task, started, False, failed=True)
+            raise
+
+    def stream(self, messages, **kwargs):
+        """Like GeminiLLM.stream; the budget applies to the first chunk.
+
+        The call is recorded when the stream ends, fails or is closed early by
+        the consumer (extract_json stops once its value is complete), the
+        last counting as a success.
+        """
+        started = time.monotonic()
+        fallback = self._fallback()
+        fell_back = False
+        failed = False
+        try:
+            if not fallback:
+                kwargs.setdefault("first_chunk_deadline", self.route["budget"])
+                yield from get_llm(self.model_name).stream(messages, **kwargs)
+                return
+
+            primary = get_llm(self.model_name).stream(messages, **kwargs)
+            first = _pool().submit(llm_metrics.bind(next), primary, None)
+            try:
+                chunk = first.result(timeout=self.route["budget"])
+                chosen = primary
+            except FutureTimeout:
+                # Let the abandoned primary finish in the background so its answer
+                # is still cached; closing it early would cache a partial response
+                first.add_done_callback(lambda f: f.exception() or _pool().submit(_drain, primary))
+                chosen, fell_back = get_llm(fallback).stream(messages, **kwargs), True
+                chunk = None
+            except LLMUnavailable:
+                chosen, fell_back = get_llm(fallback).stream(messages, **kwargs), True
+                chunk = None
+
+            if chunk is not None:
+                yield chunk
+            yield from chosen
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _record(self.task, started, fell_back, failed=failed)
+
+    def evict(self, messages):
+        get_llm(self.model_name).evict(messages)
+        if self._fallback():
+            get_llm(self._fallback()).evict(messages)
+
+
+def get_llm_for(task: str) -> RoutedLLM:
+    return RoutedLLM(task)
+
+
+def models() -> list:
+    """Every model a route may use, for warm-up."""
+    names = {r["model"] for r in ROUTES.values()} | {r["fallback"] for r in ROUTES.values() if r.get("fallback")}
+    return sorted(names)
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        report = {}
+        for task, route in ROUTES.items():
+            s = _stats.get(task, {"calls": 0, "fallbacks": 0, "errors": 0, "latency_max": 0.0, "samples": []})
+            samples = sorted(s["samples"])
+            pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))], 4) if samples else 0.0
+            report[task] = {
+                "model": route["model"],
+                "fallback": route.get("fallback"),
+                "budget": route["budget"],
+                "calls": s["calls"],
+                "errors": s["errors"],
+                "fallbacks": s["fallbacks"],
+                "fallback_rate": round(s["fallbacks"] / s["calls"], 4) if s["calls"] else 0.0,
+                "latency_p50": pick(0.5),
+                "latency_p95": pick(0.95),
+                "latency_max": round(s["latency_max"], 4)
+            }
+        return report
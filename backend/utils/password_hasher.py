@@ -0,0 +1,88 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from dotenv import load_dotenv
+from utils.custom_error import CustomError
+
+load_dotenv()
+
+# PBKDF2-SHA256 work factor for new hashes. Each user's hash stores the
+# iterations it was made with; hashes made with another value are redone on
+# the user's next login. Users from before the value was stored used 100000.
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "100000"))
+LEGACY_ITERATIONS = 100000
+# Hashing runs in its own processes so a login burst cannot starve the web
+# worker; 0 hashes in the calling thread. Hashes beyond workers + queue get a 429.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", str(4 * max(1, PASSWORD_HASH_WORKERS))))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+# Pool processes start from a clean server process rather than forking a
+# web worker with its threads and Mongo connections mid-flight
+_start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class HashingOverloaded(CustomError):
+    def __init__(self):
+        super().__init__("Too many sign-ins in progress, please retry shortly", 429)
+
+
+def pbkdf2(salt, password, iterations) -> str:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+class PasswordHasher:
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._stats = {"hashed": 0, "rejected": 0, "timeouts": 0}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Forked web workers must not share the parent's pool
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(_start_method)
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def hash(self, salt, password, iterations=PASSWORD_HASH_ITERATIONS) -> str:
+        """PBKDF2 hex digest, computed in the pool; HashingOverloaded if it is full."""
+        if self.workers <= 0:
+            return pbkdf2(salt, password, iterations)
+        if not self._slots.acquire(blocking=False):
+            self._stats["rejected"] += 1
+            raise HashingOverloaded()
+        try:
+            future = self._pool().submit(pbkdf2, salt, password, iterations)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            digest = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self._stats["timeouts"] += 1
+            raise CustomError("Sign-in is taking too long, please retry shortly", 503)
+        self._stats["hashed"] += 1
+        return digest
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "workers": self.workers, "iterations": PASSWORD_HASH_ITERATIONS}
+
+
+hasher = PasswordHasher()
@@ -1,15 +1,29 @@
-import ast
 import os
-import re
 import json
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
-from utils.gemini import GeminiLLM 
+from utils.model_router import get_llm_for
+from utils.http_client import post
+from utils.fanout import fan_out
+from utils import search_cache, single_flight, backends, llm_dispatcher, llm_metrics
+from utils.json_extract import extract_json, validate_outline, validate_evaluation, validate_patch
 
 load_dotenv()
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 
+# Response cache lifetimes (seconds) for the LLM prompts issued here
+OUTLINE_CACHE_TTL = 24 * 3600
+MCQ_CACHE_TTL = 7 * 24 * 3600
+
+MCQ_CONCURRENCY = int(os.getenv("MCQ_CONCURRENCY", "4"))
+MCQ_ATTEMPTS = int(os.getenv("MCQ_ATTEMPTS", "3"))
+# MCQs are normally generated on first assessment access (services.assessment_service)
+MCQ_EAGER = os.getenv("MCQ_EAGER", "False") == "True"
+
+@llm_metrics.tagged("outline")
 def get_modules_with_subtopics(topic: str, llm) -> list:
     prompt = f"""
 From the below conversation between a mentee and a mentor, identify the main topics that
@@ -31,33 +45,66 @@ Respond ONLY with a valid JSON list:
   }}
 ]
 """
-    response = llm.invoke([{"role": "user", "content": prompt}])
-    content = response.content.strip()
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        # Parse while the response streams in; reading stops once the list closes
+        with llm_metrics.parsing():
+            return validate_outline(extract_json(llm.stream(messages, cache_ttl=OUTLINE_CACHE_TTL), expect="["))
+    except ValueError as e:
+        print("\nFailed to parse LLM output:", e)
+        llm.evict(messages)
+        raise e
 
-    match = re.search(r"```(?:json)?\s*(\[.*?\])\s*```", content, re.DOTALL)
-    json_str = match.group(1).strip() if match else content.strip()
+def _search_failed(reason) -> list:
+    return [{"type": "other", "title": "Search failed", "url": str(reason), "completed": False}]
 
-    try:
-        return json.loads(json_str)
-    except json.JSONDecodeError:
-        try:
-            print(json_str)
-            return ast.literal_eval(json_str)
-        except Exception as e:
-            print("\nFailed to parse LLM output:", json_str)
-            raise e
 
-def search_resources(query: str) -> list:
+def _fetch_search(query: str, key: str) -> dict:
+    """Call Serper and record the outcome in the search cache."""
     headers = {
         "X-API-KEY": SERPER_API_KEY,
         "Content-Type": "application/json"
     }
-    res = requests.post("https://google.serper.dev/search", headers=headers, json={"q": query})
 
-    if res.status_code != 200:
-        return [{"type": "other", "title": "Search failed", "url": str(res.status_code), "completed": False}]
+    def live():
+        res = post("https://google.serper.dev/search", headers=headers, json={"q": query})
+        return res.status_code, res.json() if res.status_code == 200 else None
+
+    try:
+        status_code, body = backends.serper_search(query, live)
+    except requests.RequestException as e:
+        print(f"Search request failed for '{query}': {e}")
+        search_cache.put(key, query, error=type(e).__name__)
+        return {"error": type(e).__name__}
+
+    if status_code != 200:
+        search_cache.put(key, query, error=str(status_code))
+        return {"error": str(status_code)}
+
+    organic = [
+        {"title": r["title"], "link": r["link"]}
+        for r in body.get("organic", [])[:3]
+    ]
+    search_cache.put(key, query, organic=organic)
+    return {"organic": organic}
+
+
+def search_resources(query: str) -> list:
+    key = search_cache.make_key(query)
+    entry = search_cache.get(key)
+    if entry is None:
+        # Identical searches already in flight (here or in another worker) share one request
+        entry = single_flight.shared_call(
+            f"search:{key}",
+            lambda: _fetch_search(query, key),
+            lookup=lambda: search_cache.get(key)
+        )
+    if "error" in entry:
+        return _search_failed(entry["error"])
+    return _to_resources(entry["organic"])
 
-    organic = res.json().get("organic", [])[:3]
+
+def _to_resources(organic: list) -> list:
     resources = []
     for r in organic:
         url = r["link"]
@@ -71,24 +118,15 @@ def search_resources(query: str) -> list:
     return resources[:2]
 
 
-def create_roadmap(topic) -> dict:
-    llm = GeminiLLM(api_key=os.getenv("GEMINI_API_KEY"))
-    modules = get_modules_with_subtopics(topic, llm)
-    enriched_modules = []
-
-    for mod in modules:
-        enriched_subtopics = []
-        for sub in mod["subtopics"]:
-            resources = search_resources(f"{sub} {topic} site:youtube.com OR site:coursera.org OR free learning")
-            # if resources and resources[0]["title"] == "Search failed":
-            #     continue
-            enriched_subtopics.append({
-                "title": sub,
-                "resources": resources
-            })
+@llm_metrics.tagged("mcq")
+def generate_module_evaluation(subtopics: list, llm, priority: str = llm_dispatcher.BACKGROUND) -> dict:
+    """Generate the MCQ evaluation for one module, retrying on bad output.
 
-        subtopic_list = ", ".join(mod["subtopics"])
-        question_prompt = f"""
+    Returns an empty dict if every attempt fails so one module cannot sink
+    the whole roadmap.
+    """
+    subtopic_list = ", ".join(subtopics)
+    question_prompt = f"""
 You're an educational AI assistant. Create 5 multiple-choice questions to evaluate understanding of the following subtopics: {subtopic_list}. Ensure that you have both medium and hard questions.
 Format your response as valid JSON:
 
@@ -107,24 +145,136 @@ Format your response as valid JSON:
   "question5": {{ ... }}
 }}
 """
+    eval_messages = [{"role": "user", "content": question_prompt}]
 
-        eval_response = llm.invoke([{"role": "user", "content": question_prompt}])
-        content = eval_response.content.strip()
-
-        match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", content, re.DOTALL)
-        json_str = match.group(1).strip() if match else content.strip()
-
+    for attempt in range(1, MCQ_ATTEMPTS + 1):
         try:
-            evaluation_questions = json.loads(json_str)
+            with llm_metrics.parsing():
+                return validate_evaluation(extract_json(
+                    llm.stream(eval_messages, cache_ttl=MCQ_CACHE_TTL, priority=priority), expect="{"
+                ))
+        except (llm_dispatcher.LLMOverloaded, llm_dispatcher.LLMDeadlineExceeded):
+            # Rejected by the LLM dispatcher; retrying here would only add load
+            raise
         except Exception as e:
-            print("Failed to parse evaluation questions:\n", content)
-            raise e
+            print(f"Failed to generate evaluation questions (attempt {attempt}/{MCQ_ATTEMPTS}): {e}")
+            llm.evict(eval_messages)
+            if attempt < MCQ_ATTEMPTS:
+                time.sleep(0.5 * attempt)
+    return {}
+
+
+class RoadmapCheckpoint:
+    """Stages of a roadmap build completed so far.
+
+    This base class only keeps them in memory; subclasses persist each save
+    so a retried build can resume instead of starting over.
+    """
+
+    def __init__(self, outline=None, resources=None, evaluations=None):
+        self.outline = outline
+        self.resources = {int(k): v for k, v in (resources or {}).items()}
+        self.evaluations = {int(k): v for k, v in (evaluations or {}).items()}
+
+    def save_outline(self, modules):
+        self.outline = modules
+
+    def save_resources(self, module_index, subtopics):
+        self.resources[module_index] = subtopics
+
+    def save_evaluation(self, module_index, evaluation):
+        self.evaluations[module_index] = evaluation
+
+
+@llm_metrics.tagged("create_roadmap")
+def create_roadmap(topic, on_progress=None, checkpoint=None) -> dict:
+    """Build the roadmap modules for a conversation.
+
+    on_progress(stage, modules_done, modules_total) is called as stages finish.
+    Stages already present in checkpoint are reused rather than regenerated.
+    """
+    def report(stage, done=0, total=0):
+        if on_progress:
+            on_progress(stage, done, total)
 
+    checkpoint = checkpoint or RoadmapCheckpoint()
+    if checkpoint.outline:
+        modules = checkpoint.outline
+    else:
+        report("outline")
+        modules = get_modules_with_subtopics(topic, get_llm_for("roadmap_outline"))
+        checkpoint.save_outline(modules)
+    total = len(modules)
+
+    # Issue every outstanding subtopic search up front; results come back in query order
+    queries = []
+    query_owner = []
+    module_results = {}
+    for i, mod in enumerate(modules):
+        if i in checkpoint.resources:
+            continue
+        module_results[i] = [None] * len(mod["subtopics"])
+        for j, sub in enumerate(mod["subtopics"]):
+            queries.append(f"{sub} {topic} site:youtube.com OR site:coursera.org OR free learning")
+            query_owner.append((i, j))
+
+    modules_done = [total - len(module_results)]
+
+    def module_searched(i):
+        enriched_subtopics = []
+        for sub, resources in zip(modules[i]["subtopics"], module_results[i]):
+            # if resources and resources[0]["title"] == "Search failed":
+            #     continue
+            enriched_subtopics.append({
+                "title": sub,
+                "resources": resources
+            })
+        checkpoint.save_resources(i, enriched_subtopics)
+        modules_done[0] += 1
+        report("resources", modules_done[0], total)
+
+    def search_finished(index, result):
+        i, j = query_owner[index]
+        module_results[i][j] = result
+        if all(r is not None for r in module_results[i]):
+            module_searched(i)
+
+    report("resources", modules_done[0], total)
+    for i, results in module_results.items():
+        if not results:
+            module_searched(i)
+
+    def module_evaluated(i, evaluation):
+        # An empty evaluation means generation failed; leave it out so a resume retries it
+        if evaluation:
+            checkpoint.save_evaluation(i, evaluation)
+
+    if MCQ_EAGER:
+        # MCQ generation runs on its own pool so it overlaps with the searches
+        with ThreadPoolExecutor(max_workers=max(1, MCQ_CONCURRENCY)) as mcq_pool:
+            mcq_llm = get_llm_for("mcq")
+            eval_futures = {
+                i: mcq_pool.submit(llm_metrics.bind(generate_module_evaluation), mod["subtopics"], mcq_llm)
+                for i, mod in enumerate(modules)
+                if i not in checkpoint.evaluations
+            }
+            fan_out(search_resources, queries, on_result=search_finished)
+            evaluated = len(modules) - len(eval_futures)
+            report("evaluations", evaluated, total)
+            for i, future in eval_futures.items():
+                module_evaluated(i, future.result())
+                evaluated += 1
+                report("evaluations", evaluated, total)
+    else:
+        fan_out(search_resources, queries, on_result=search_finished)
+
+    enriched_modules = []
+    for i, mod in enumerate(modules):
         enriched_modules.append({
             "title": mod["title"],
             "objective": mod["objective"],
-            "subtopics": enriched_subtopics,
-            "evaluation": evaluation_questions
+            "subtopics": checkpoint.resources[i],
+            "evaluation": checkpoint.evaluations.get(i, {})
         })
 
     return enriched_modules
@@ -147,8 +297,9 @@ def enrich_subtopics_with_resources(roadmap):
     return roadmap
 
 
+@llm_metrics.tagged("edit_roadmap")
 def edit_roadmap(roadmap, instructions):
-    llm = GeminiLLM(api_key=os.getenv("GEMINI_API_KEY"))
+    llm = get_llm_for("edit")
 
     prompt = f'''
     You are an educational AI assistant. Follow the instructions given and modify the roadmap given below accordingly.
@@ -158,17 +309,81 @@ def edit_roadmap(roadmap, instructions):
     Roadmap: {roadmap}
     '''
 
-    response = llm.invoke([{"role": "user", "content": prompt}])
-    content = response.content.strip()
+    with llm_metrics.parsing():
+        updated_roadmap = extract_json(llm.stream([{"role": "user", "content": prompt}]), expect="{")
 
-    match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", content, re.DOTALL)
-    json_str = match.group(1).strip() if match else content
+    return enrich_subtopics_with_resources(updated_roadmap)
 
-    try:
-        updated_roadmap = json.loads(json_str)
-    except json.JSONDecodeError:
-        cleaned = re.sub(r"```(?:json)?|```", "", json_str).strip()
-        updated_roadmap = ast.literal_eval(cleaned)
 
-    return enrich_subtopics_with_resources(updated_roadmap)
+
+def _roadmap_outline(roadmap) -> list:
+    """Compact view of a roadmap for edit prompts: no resources or evaluations."""
+    return [
+        {
+            "index": i,
+            "title": module.get("title"),
+            "objective": module.get("objective"),
+            "subtopics": [s.get("title") if isinstance(s, dict) else s for s in module.get("subtopics", [])]
+        }
+        for i, module in enumerate(roadmap.get("modules", []))
+    ]
+
+
+@llm_metrics.tagged("plan_roadmap_edit")
+def plan_roadmap_edit(roadmap, instructions) -> dict:
+    """Ask the LLM for a structured patch instead of a rewritten roadmap.
+
+    Returns {"modify": [...], "remove": [indices], "add": [modules]} where
+    modified/added subtopics already carry their searched resources. Only
+    subtopics that are new get searched; existing ones keep their progress.
+    """
+    llm = get_llm_for("edit")
+    outline = _roadmap_outline(roadmap)
+
+    prompt = f'''
+    You are an educational AI assistant. Follow the instructions given and decide how the roadmap outline below must change.
+    Respond ONLY with a valid JSON object describing the changes, using module indexes from the outline:
+
+    {{
+      "modify_modules": [
+        {{"index": <int>, "title": "<new title, optional>", "objective": "<new objective, optional>",
+          "add_subtopics": ["<subtopic>", ...], "remove_subtopics": ["<existing subtopic title>", ...]}}
+      ],
+      "remove_modules": [<int>, ...],
+      "add_modules": [
+        {{"title": "<module title>", "objective": "<brief objective>", "subtopics": ["<subtopic>", ...]}}
+      ]
+    }}
+
+    Leave a list empty when nothing of that kind changes.
+
+    Instructions: {instructions}
+    Roadmap outline: {json.dumps(outline, ensure_ascii=False)}
+    '''
+
+    with llm_metrics.parsing():
+        patch = validate_patch(extract_json(llm.stream([{"role": "user", "content": prompt}]), expect="{"), outline)
+    modify, add = patch["modify"], patch["add"]
+
+    # Search only the subtopics this edit introduces
+    new_subtopics = []
+    for change in modify:
+        title = change["title"] or outline[change["index"]]["title"]
+        new_subtopics.extend((change, sub, title) for sub in change["add_subtopics"])
+    for module in add:
+        new_subtopics.extend((module, sub, module["title"]) for sub in module["subtopics"])
+
+    queries = [f"{sub} {title} site:youtube.com OR site:coursera.org OR free learning" for _, sub, title in new_subtopics]
+    results = fan_out(search_resources, queries)
+
+    enriched = {}
+    for (owner, sub, _), resources in zip(new_subtopics, results):
+        enriched.setdefault(id(owner), []).append({"title": sub, "resources": resources})
+    for change in modify:
+        change["add_subtopics"] = enriched.get(id(change), [])
+    for module in add:
+        module["subtopics"] = enriched.get(id(module), [])
+        module["evaluation"] = {}
+
+    return patch
 
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from database.db import search_cache
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(7 * 24 * 3600)))
+SEARCH_NEGATIVE_TTL = int(os.getenv("SEARCH_NEGATIVE_TTL", "60"))
+
+# Filler words that don't change what Serper returns for a learning-resource query.
+# "or" is deliberately absent: it is a search operator in our queries.
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "and", "with", "by",
+    "at", "from", "into", "about", "how", "what", "is", "are", "using", "your"
+}
+
+_memory = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+_stats = {"mongo_hits": 0, "mongo_misses": 0, "mongo_errors": 0, "negative_hits": 0}
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, punctuation-only differences, whitespace and stopwords.
+
+    Skill aliases are deliberately not folded: the taxonomy groups related
+    skills ("hadoop" and "spark" are both big data), and merging their keys
+    would serve one query's results for another.
+    """
+    tokens = re.split(r"\s+", query.lower().strip())
+    kept = []
+    for token in tokens:
+        if not token.startswith("site:"):
+            token = re.sub(r"[^\w+#.]+", " ", token).strip()
+        for part in token.split():
+            if part not in STOPWORDS:
+                kept.append(part)
+    return " ".join(kept)
+
+
+def make_key(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+def get(key: str):
+    """Cached entry for a key: {"organic": [...]} or {"error": "..."} for a recent failure."""
+    cached = _memory.get(key)
+    if cached is None:
+        try:
+            doc = search_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            _stats["mongo_errors"] += 1
+            print(f"Search cache lookup failed: {e}")
+            return None
+        if not doc:
+            _stats["mongo_misses"] += 1
+            return None
+        _stats["mongo_hits"] += 1
+        cached = {"organic": doc["organic"]} if doc.get("error") is None else {"error": doc["error"]}
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        _memory.set(key, cached, ttl=remaining)
+
+    if "error" in cached:
+        _stats["negative_hits"] += 1
+    return cached
+
+
+def put(key: str, query: str, organic: list = None, error: str = None):
+    """Store organic results, or a failure for the short negative TTL."""
+    ttl = SEARCH_CACHE_TTL if error is None else SEARCH_NEGATIVE_TTL
+    entry = {"organic": organic} if error is None else {"error": error}
+    _memory.set(key, entry, ttl=ttl)
+    now = datetime.utcnow()
+    try:
+        search_cache.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "query": normalize_query(query),
+                "organic": organic,
+                "error": error,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl)
+            },
+            upsert=True
+        )
+    except Exception as e:
+        _stats["mongo_errors"] += 1
+        print(f"Search cache write failed: {e}")
+
+
+def get_stats() -> dict:
+    memory = _memory.stats()
+    lookups = memory["hits"] + memory["misses"]
+    hits = memory["hits"] + _stats["mongo_hits"]
+    return {
+        "memory": memory,
+        "overall_hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        **_stats
+    }
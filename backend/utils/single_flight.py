@@ -0,0 +1,164 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+from database.db import flight_leases
+from utils.custom_error import CustomError
+
+load_dotenv()
+
+# Cross-worker coalescing relies on the leader writing its result to a shared
+# cache tier (llm_cache / search_cache) that followers can poll.
+SINGLE_FLIGHT_DISTRIBUTED = os.getenv("SINGLE_FLIGHT_DISTRIBUTED", "True") == "True"
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "60"))
+SINGLE_FLIGHT_POLL_SECONDS = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", "0.25"))
+# How long an in-process follower waits for the leader before giving up
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "360"))
+
+_stats = {"leaders": 0, "coalesced": 0, "remote_waits": 0, "remote_hits": 0, "lease_errors": 0}
+
+
+class FlightTimeout(CustomError):
+    def __init__(self, timeout):
+        super().__init__(f"Identical request still in progress after {timeout:g}s, please retry", 504)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        timeout = SINGLE_FLIGHT_WAIT_SECONDS if timeout is None else timeout
+        if not self.event.wait(timeout):
+            raise FlightTimeout(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class Group:
+    """Coalesces concurrent calls with the same key within this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def begin(self, key):
+        """Returns (is_leader, call). The leader must call finish() exactly once."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                _stats["coalesced"] += 1
+                return False, call
+            call = _Call()
+            self._calls[key] = call
+            _stats["leaders"] += 1
+            return True, call
+
+    def finish(self, key, call, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        call.result = result
+        call.error = error
+        call.event.set()
+
+    def do(self, key, fn, timeout=None):
+        leader, call = self.begin(key)
+        if not leader:
+            return call.wait(timeout)
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result
+
+
+group = Group()
+_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(key, seconds=None) -> bool:
+    """Take the cross-worker lease for key; an expired lease can be taken over."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds or SINGLE_FLIGHT_LEASE_SECONDS)
+    try:
+        flight_leases.insert_one({"_id": key, "owner": _owner, "expires_at": expires_at})
+        return True
+    except DuplicateKeyError:
+        taken = flight_leases.update_one(
+            {"_id": key, "expires_at": {"$lt": now}},
+            {"$set": {"owner": _owner, "expires_at": expires_at}}
+        )
+        return taken.modified_count > 0
+    except Exception as e:
+        # Coordination is an optimization; never block the call on it
+        _stats["lease_errors"] += 1
+        print(f"Single-flight lease failed for {key}: {e}")
+        return True
+
+
+def release_lease(key):
+    try:
+        flight_leases.delete_one({"_id": key, "owner": _owner})
+    except Exception as e:
+        _stats["lease_errors"] += 1
+        print(f"Single-flight release failed for {key}: {e}")
+
+
+def wait_for_remote(key, lookup, timeout=None):
+    """Poll lookup() while another worker holds the lease; None if it never delivers."""
+    _stats["remote_waits"] += 1
+    deadline = time.monotonic() + (timeout or SINGLE_FLIGHT_LEASE_SECONDS)
+    while time.monotonic() < deadline:
+        result = lookup()
+        if result is not None:
+            _stats["remote_hits"] += 1
+            return result
+        try:
+            if not flight_leases.find_one({"_id": key}, {"_id": 1}):
+                return lookup()
+        except Exception:
+            return None
+        time.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+    return None
+
+
+def remote_wait_budget() -> float:
+    """Longest a leader may wait_for_remote before doing the work itself."""
+    return SINGLE_FLIGHT_LEASE_SECONDS if SINGLE_FLIGHT_DISTRIBUTED else 0
+
+
+def shared_call(key, fn, lookup=None, timeout=None):
+    """Run fn once for all concurrent callers with this key.
+
+    Callers in this process share the leader's result directly. When lookup
+    is given (a read of the shared cache fn populates), workers in other
+    processes also wait on a Mongo lease instead of repeating the call.
+    Followers in this process give up after timeout seconds (default
+    SINGLE_FLIGHT_WAIT_SECONDS) with FlightTimeout; with lookup, the timeout
+    should allow for remote_wait_budget() on top of fn's own duration.
+    """
+    def run():
+        if lookup is None or not SINGLE_FLIGHT_DISTRIBUTED:
+            return fn()
+        if not acquire_lease(key):
+            result = wait_for_remote(key, lookup)
+            if result is not None:
+                return result
+        try:
+            return fn()
+        finally:
+            release_lease(key)
+
+    return group.do(key, run, timeout)
+
+
+def get_stats() -> dict:
+    return {"distributed": SINGLE_FLIGHT_DISTRIBUTED, "in_flight": len(group._calls), **_stats}
@@ -0,0 +1,257 @@
+"""Canonical skill IDs for free-text skills, goals and queries.
+
+"ML", "machine learning" and "Machine-Learning" all resolve to the same
+integer ID, so matching and analytics can key on IDs instead of fuzzy
+strings. Text is normalised and scanned once with an Aho-Corasick
+automaton over every alias, so lookup is linear in the text length however
+many aliases there are.
+
+IDs are stable: never renumber an entry, only add new ones. Deployments can
+add or override entries with a JSON file at SKILL_TAXONOMY_FILE, a list of
+{"id", "name", "aliases", "exact"} objects.
+
+Backfill stored profiles with:  python -m utils.skill_taxonomy
+"""
+import json
+import os
+import re
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SKILL_TAXONOMY_FILE = os.getenv("SKILL_TAXONOMY_FILE")
+
+# id: (canonical name, aliases, aliases matched only when they are the whole
+# phrase - short words like "go" or "r" that are ordinary English elsewhere)
+SKILLS = {
+    1: ("python", ["python3", "py"], []),
+    2: ("javascript", ["js", "ecmascript", "es6"], []),
+    3: ("typescript", ["ts"], []),
+    4: ("java", ["core java", "java se"], []),
+    5: ("c++", ["cpp", "cplusplus"], []),
+    6: ("c", [], ["c", "c language", "c programming"]),
+    7: ("c#", ["csharp", "c sharp"], []),
+    8: ("go", ["golang"], ["go"]),
+    9: ("rust", ["rustlang"], []),
+    10: ("kotlin", [], []),
+    11: ("swift", [], []),
+    12: ("r", ["rlang", "r programming"], ["r"]),
+    13: ("sql", ["structured query language"], []),
+    14: ("html", ["html5"], []),
+    15: ("css", ["css3"], []),
+    16: ("react", ["reactjs", "react.js"], []),
+    17: ("angular", ["angularjs", "angular.js"], []),
+    18: ("vue", ["vuejs", "vue.js"], []),
+    19: ("next.js", ["nextjs"], []),
+    20: ("node.js", ["nodejs", "node"], []),
+    21: ("django", [], []),
+    22: ("flask", [], []),
+    23: ("spring boot", ["springboot", "spring framework"], []),
+    24: ("machine learning", ["ml"], []),
+    25: ("deep learning", ["neural networks", "neural network"], ["dl"]),
+    26: ("artificial intelligence", ["ai"], []),
+    27: ("data science", ["data scientist"], []),
+    28: ("data analysis", ["data analytics", "data analyst"], []),
+    29: ("natural language processing", ["nlp"], []),
+    30: ("computer vision", ["image processing"], ["cv"]),
+    31: ("generative ai", ["genai", "gen ai", "large language models", "llm", "llms"], []),
+    32: ("tensorflow", [], ["tf"]),
+    33: ("pytorch", ["torch"], []),
+    34: ("pandas", [], []),
+    35: ("numpy", [], []),
+    36: ("statistics", ["stats"], []),
+    37: ("data structures and algorithms", ["dsa", "data structures", "algorithms"], []),
+    38: ("system design", ["systems design"], []),
+    39: ("web development", ["web dev", "webdev"], []),
+    40: ("frontend development", ["frontend", "front end", "front end development"], []),
+    41: ("backend development", ["backend", "back end", "back end development"], []),
+    42: ("full stack development", ["full stack", "fullstack", "mern", "mean stack"], []),
+    43: ("mobile development", ["mobile app development", "app development"], []),
+    44: ("android", ["android development"], []),
+    45: ("ios", ["ios development"], []),
+    46: ("flutter", [], []),
+    47: ("react native", [], []),
+    48: ("devops", ["dev ops"], []),
+    49: ("docker", ["containers", "containerization"], []),
+    50: ("kubernetes", ["k8s"], []),
+    51: ("aws", ["amazon web services"], []),
+    52: ("azure", ["microsoft azure"], []),
+    53: ("google cloud", ["gcp", "google cloud platform"], []),
+    54: ("cloud computing", ["cloud"], []),
+    55: ("ci/cd", ["ci cd", "cicd", "continuous integration"], []),
+    56: ("linux", ["unix"], []),
+    57: ("git", ["github", "version control"], []),
+    58: ("mongodb", ["mongo"], []),
+    59: ("postgresql", ["postgres"], []),
+    60: ("mysql", [], []),
+    61: ("databases", ["database", "dbms"], []),
+    62: ("cybersecurity", ["cyber security", "information security", "infosec", "security"], []),
+    63: ("blockchain", ["web3"], []),
+    64: ("ui/ux design", ["ui ux", "ux", "ui design", "ux design", "user experience"], []),
+    65: ("product management", ["product manager"], []),
+    66: ("project management", ["project manager"], []),
+    67: ("software testing", ["testing", "qa", "quality assurance"], []),
+    68: ("rest apis", ["rest api", "restful apis", "api development"], ["rest"]),
+    69: ("graphql", [], []),
+    70: ("big data", ["hadoop", "spark", "apache spark"], []),
+    71: ("data engineering", ["data engineer", "etl"], []),
+    72: ("communication", ["communication skills", "public speaking"], []),
+    73: ("leadership", ["team leadership"], []),
+    74: ("career guidance", ["career growth", "career advice", "interview preparation"], []),
+}
+
+_TOKEN = re.compile(r"[a-z0-9+#][a-z0-9+#.]*")
+
+
+def normalize(text) -> str:
+    """Lower-case words separated by single spaces; punctuation other than
+    + # . inside a word (c++, c#, node.js) becomes a separator."""
+    return " ".join(t.rstrip(".") for t in _TOKEN.findall(str(text).lower()) if t.rstrip("."))
+
+
+class SkillTaxonomy:
+    def __init__(self, skills):
+        self.names = {}
+        self._exact = {}
+        # Aho-Corasick automaton over normalised aliases: goto per state,
+        # failure links, and for each state the (length, id) of the longest
+        # alias ending there plus a link to the next state that ends one
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]
+        self._out_link = [0]
+        for skill_id, (name, aliases, exact) in skills.items():
+            self.names[skill_id] = name
+            for alias in exact:
+                self._exact[normalize(alias)] = skill_id
+            for alias in [name] + list(aliases):
+                if normalize(alias) and alias not in exact:
+                    self._add(normalize(alias), skill_id)
+        self._link()
+
+    def _add(self, alias, skill_id):
+        state = 0
+        for ch in alias:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+                self._out_link.append(0)
+            state = nxt
+        self._out[state] = (len(alias), skill_id)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                target = self._fail[nxt]
+                self._out_link[nxt] = target if self._out[target] else self._out_link[target]
+
+    def _spans(self, text):
+        """Whole-word alias matches in normalised text as (start, end, id),
+        leftmost first and longest at each start, without overlaps."""
+        found = {}
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            if end < len(text) and text[end] != " ":
+                continue
+            hit = state if self._out[state] else self._out_link[state]
+            while hit:
+                length, skill_id = self._out[hit]
+                start = end - length
+                if start == 0 or text[start - 1] == " ":
+                    found[start] = (end, skill_id)  # ends only grow, so the longest wins
+                hit = self._out_link[hit]
+
+        spans = []
+        covered = 0
+        for start in sorted(found):
+            if start >= covered:
+                end, skill_id = found[start]
+                spans.append((start, end, skill_id))
+                covered = end
+        return spans
+
+    def match(self, text) -> list:
+        """Canonical IDs mentioned in a piece of text, in order of appearance."""
+        text = normalize(text)
+        if text in self._exact:
+            return [self._exact[text]]
+        ids = []
+        for _, _, skill_id in self._spans(text):
+            if skill_id not in ids:
+                ids.append(skill_id)
+        return ids
+
+    def ids(self, phrases) -> list:
+        """Canonical IDs for a list of skills or goals, deduplicated."""
+        ids = []
+        for phrase in phrases or []:
+            for skill_id in self.match(phrase):
+                if skill_id not in ids:
+                    ids.append(skill_id)
+        return ids
+
+    def name(self, skill_id):
+        return self.names.get(skill_id)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _load() -> SkillTaxonomy:
+    skills = dict(SKILLS)
+    if SKILL_TAXONOMY_FILE:
+        try:
+            with open(SKILL_TAXONOMY_FILE, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    skills[int(entry["id"])] = (entry["name"], entry.get("aliases", []), entry.get("exact", []))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Skill taxonomy file not loaded: {e}")
+    return SkillTaxonomy(skills)
+
+
+taxonomy = _load()
+
+
+def skill_ids(phrases) -> list:
+    return taxonomy.ids(phrases)
+
+
+def annotate_profile(profile: dict) -> dict:
+    """Store canonical IDs next to the raw skills/goals fields of a profile."""
+    if profile is None:
+        return profile
+    if "skills" in profile:
+        profile["skill_ids"] = skill_ids(profile.get("skills"))
+    if "goals" in profile:
+        profile["goal_ids"] = skill_ids(profile.get("goals"))
+    return profile
+
+
+if __name__ == "__main__":
+    from pymongo import UpdateOne
+    from database.db import users
+
+    ops = []
+    for user in users.find({}, {"profile.skills": 1, "profile.goals": 1}):
+        fields = annotate_profile(dict(user.get("profile") or {}))
+        ids = {f"profile.{key}": fields[key] for key in ("skill_ids", "goal_ids") if key in fields}
+        if ids:
+            ops.append(UpdateOne({"_id": user["_id"]}, {"$set": ids}))
+    if ops:
+        users.bulk_write(ops, ordered=False)
+    print(f"Annotated {len(ops)} profiles with {len(taxonomy)} canonical skills")
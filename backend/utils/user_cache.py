@@ -0,0 +1,59 @@
+import copy
+import os
+import threading
+from dotenv import load_dotenv
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+# Authenticated user documents, per worker. Writes made through this worker
+# invalidate immediately; writes made by other workers (or worker.py) show up
+# after at most USER_CACHE_TTL seconds, which is the staleness bound. 0 disables.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+
+_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_lock = threading.Lock()
+_epoch = 0
+_invalidations = 0
+_projections = set()
+
+
+def get(user_id, load, projection="full"):
+    """The user document for user_id, from cache or load(user_id).
+
+    projection names what load returns, so differently projected copies of
+    one user are cached side by side. Callers get their own copy, so a route
+    changing it cannot leak into other requests.
+    """
+    key = (str(user_id), projection)
+    _projections.add(projection)
+    if USER_CACHE_TTL <= 0:
+        return load(str(user_id))
+    user = _cache.get(key)
+    if user is None:
+        epoch = _epoch
+        user = load(str(user_id))
+        if user is None:
+            return None
+        with _lock:
+            # An invalidation while loading means the document may predate it
+            if epoch == _epoch:
+                _cache.set(key, user)
+    return copy.deepcopy(user)
+
+
+def invalidate(*user_ids):
+    """Drop users after a write so the next request reads them from Mongo."""
+    global _epoch, _invalidations
+    with _lock:
+        _epoch += 1
+        for user_id in user_ids:
+            if user_id is not None:
+                for projection in tuple(_projections):
+                    _cache.pop((str(user_id), projection))
+                _invalidations += 1
+
+
+def get_stats() -> dict:
+    return {**_cache.stats(), "ttl": USER_CACHE_TTL, "invalidations": _invalidations}
@@ -0,0 +1,44 @@
+import os
+import signal
+import socket
+import time
+from dotenv import load_dotenv
+
+from models.roadmap_job import RoadmapJobModel
+from services.roadmap_job_service import run_job, JOB_LEASE_SECONDS
+from utils.gemini import warm_up
+from utils import model_router
+
+load_dotenv()
+
+POLL_INTERVAL = float(os.getenv("ROADMAP_JOB_POLL_SECONDS", "1"))
+
+_stopping = False
+
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def main():
+    """Claim and run roadmap jobs until SIGTERM/SIGINT; run one process per core to scale."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    warm_up(model_router.models())
+    print(f"Roadmap worker {worker_id} started")
+
+    while not _stopping:
+        job = RoadmapJobModel.claim(worker_id, JOB_LEASE_SECONDS)
+        if not job:
+            time.sleep(POLL_INTERVAL)
+            continue
+        print(f"Roadmap worker {worker_id} running job {job['_id']} (attempt {job['attempts']})")
+        run_job(job, worker_id)
+
+    print(f"Roadmap worker {worker_id} stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -47,13 +47,25 @@ export default function AssessmentPage() {
       }
 
       try {
-        const response = await fetch(
+        let response = await fetch(
           `http://localhost:5000/api/roadmaps/${roadmapId}/${moduleId}/assessment/get`,
           {
             credentials: "include",
           }
         )
 
+        // 202 means the questions are still being generated; ask again when told to
+        while (response.status === 202) {
+          const retryAfter = Number(response.headers.get("Retry-After")) || 5
+          await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+          response = await fetch(
+            `http://localhost:5000/api/roadmaps/${roadmapId}/${moduleId}/assessment/get`,
+            {
+              credentials: "include",
+            }
+          )
+        }
+
         const data = await response.json()
 
         if (!response.ok) {